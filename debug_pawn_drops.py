@@ -4,12 +4,53 @@
 Debug script to check why pawn drop moves are not showing up.
 """
 
+from functools import lru_cache
+
 import shogi
 
+# Parsed moves are never mutated, so repeated USI strings can share them
+from_usi = lru_cache(maxsize=4096)(shogi.Move.from_usi)
+
+# Squares where a dropped piece could never move again, per piece type and color,
+# precomputed once so the drop diagnostics are a single bitwise AND
+NO_DROP_MASK = {
+    piece_type: tuple(
+        sum(shogi.BB_SQUARES[square] for square in shogi.SQUARES
+            if not shogi.can_move_without_promotion(square, piece_type, color))
+        for color in shogi.COLORS
+    )
+    for piece_type in (shogi.PAWN, shogi.LANCE, shogi.KNIGHT)
+}
+NO_PAWN_DROP_MASK = NO_DROP_MASK[shogi.PAWN]
+
+def pawn_file_mask(pawns):
+    """Spread every pawn bit over its whole file (file fill, no rotated bitboards)"""
+    m = pawns
+    m |= m >> 9
+    m |= m >> 18
+    m |= m >> 36
+    m |= m >> 72
+    m &= shogi.BB_RANK_A
+    m |= m << 9
+    m |= m << 18
+    m |= m << 36
+    m |= m << 72
+    return m & shogi.BB_ALL
+
+def iter_squares(bb):
+    """Yield the squares of the set bits of a bitboard"""
+    while bb:
+        yield (bb & -bb).bit_length() - 1
+        bb &= bb - 1
+
 def debug_pawn_drops():
     """Debug pawn drop availability"""
     print("=== Debug Pawn Drop Issues ===\n")
     
+    # Bind hot module attributes to locals once
+    PAWN = shogi.PAWN
+    BLACK = shogi.BLACK
+    
     # Create a board similar to what's shown in the screenshot
     board = shogi.Board()
     
@@ -17,69 +58,79 @@ def debug_pawn_drops():
     moves = ['7g7f', '3c3d', '2g2f', '8c8d']
     
     for move_str in moves:
-        move = shogi.Move.from_usi(move_str)
+        move = from_usi(move_str)
         if move in board.legal_moves:
             board.push(move)
             print(f"Made move: {move_str}")
     
     # Add a pawn to black's hand manually
-    board.add_piece_into_hand(shogi.PAWN, shogi.BLACK, 1)
+    board.add_piece_into_hand(PAWN, BLACK, 1)
+    turn = board.turn
     print(f"\nAdded pawn to Black's hand")
-    print(f"Black pieces in hand: {dict(board.pieces_in_hand[shogi.BLACK])}")
-    print(f"Current turn: {'Black' if board.turn == shogi.BLACK else 'White'}")
+    print(f"Black pieces in hand: {dict(board.pieces_in_hand[BLACK])}")
+    print(f"Current turn: {'Black' if turn == BLACK else 'White'}")
     print()
     
     # Check all legal moves
     legal_moves = list(board.legal_moves)
     print(f"Total legal moves: {len(legal_moves)}")
     
-    # Filter drop moves
-    drop_moves = [move for move in legal_moves if move.drop_piece_type is not None]
+    # Split drops, pawn drops and drop destinations out in a single pass
+    drop_moves = []
+    pawn_drops = []
+    legal_drop_squares_by_piece = {piece_type: set() for piece_type in shogi.PIECE_TYPES}
+    for move in legal_moves:
+        drop_piece_type = move.drop_piece_type
+        if drop_piece_type is None:
+            continue
+        drop_moves.append(move)
+        legal_drop_squares_by_piece[drop_piece_type].add(move.to_square)
+        if drop_piece_type == PAWN:
+            pawn_drops.append(move)
     print(f"Total drop moves: {len(drop_moves)}")
-    
-    # Filter pawn drop moves
-    pawn_drops = [move for move in legal_moves if move.drop_piece_type == shogi.PAWN]
     print(f"Pawn drop moves: {len(pawn_drops)}")
     
+    # Piece types actually available for dropping
+    in_hand = {piece_type: count for piece_type, count in board.pieces_in_hand[turn].items() if count}
+    
     if pawn_drops:
         print("Available pawn drops:")
         for move in pawn_drops[:10]:  # Show first 10
             print(f"  {move.usi()}")
+    elif PAWN not in in_hand:
+        # Nothing to diagnose without a pawn in hand
+        print("No pawns in hand")
     else:
         print("No pawn drops available!")
         print("\nChecking why...")
         
-        # Check each empty square
-        empty_squares = []
-        for square in range(81):
-            if board.piece_at(square) is None:
-                empty_squares.append(square)
-        
-        print(f"Found {len(empty_squares)} empty squares")
+        # Candidate squares as bitboards instead of probing all 81 squares
+        empties = board.occupied.non_occupied()
+        file_mask = pawn_file_mask(board.piece_bb[PAWN] & board.occupied[turn])
+        print(f"Found {shogi.pop_count(empties)} empty squares")
         
-        # Test dropping on each empty square
         problematic_squares = []
-        for square in empty_squares:
-            test_move = shogi.Move(None, square, False, shogi.PAWN)
-            if test_move not in legal_moves:
-                file = square % 9
-                rank = square // 9
-                square_name = f"{9-file}{chr(ord('a')+rank)}"
-                
-                # Check specific reasons
-                reason = "Unknown"
-                
-                # Check if it's a double pawn
-                if board.is_double_pawn(square, shogi.PAWN):
-                    reason = "Double pawn (another pawn in same file)"
-                # Check if pawn can move after dropping
-                elif not shogi.can_move_without_promotion(square, shogi.PAWN, board.turn):
-                    reason = "Cannot move after drop (back rank)"
-                # Check if it creates check illegally
-                elif board.is_suicide_or_check_by_dropping_pawn(test_move):
+        # Cheapest predicate first: back rank, then double pawn
+        for mask, reason in (
+            (empties & NO_PAWN_DROP_MASK[turn], "Cannot move after drop (back rank)"),
+            (empties & ~NO_PAWN_DROP_MASK[turn] & file_mask, "Double pawn (another pawn in same file)"),
+        ):
+            for square in iter_squares(mask):
+                problematic_squares.append((square, reason))
+        
+        # Only the remaining squares need the expensive uchifuzume test
+        candidates = empties & ~NO_PAWN_DROP_MASK[turn] & ~file_mask
+        legal_pawn_drop_squares = legal_drop_squares_by_piece[PAWN]
+        for square in iter_squares(candidates):
+            if square not in legal_pawn_drop_squares:
+                if board.is_suicide_or_check_by_dropping_pawn(shogi.Move(None, square, False, PAWN)):
                     reason = "Illegal check/suicide by pawn drop"
-                
-                problematic_squares.append(f"{square_name}: {reason}")
+                else:
+                    reason = "Unknown"
+                problematic_squares.append((square, reason))
+        
+        problematic_squares.sort()
+        problematic_squares = [f"{shogi.SQUARE_NAMES[square]}: {reason}" for square, reason in problematic_squares]
         
         if problematic_squares:
             print(f"\nProblematic squares ({len(problematic_squares)}):")
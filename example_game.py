@@ -5,8 +5,13 @@ Simple example showing how to start playing shogi with python-shogi library.
 This script demonstrates basic game setup, move making, and board display.
 """
 
+from functools import lru_cache
+
 import shogi
 
+# Parsed moves are never mutated, so repeated USI strings can share them
+from_usi = lru_cache(maxsize=4096)(shogi.Move.from_usi)
+
 def main():
     print("=== Python Shogi Game Example ===\n")
     
@@ -32,7 +37,7 @@ def main():
     
     for move_usi in moves_to_play:
         try:
-            move = shogi.Move.from_usi(move_usi)
+            move = from_usi(move_usi)
             if move in board.legal_moves:
                 board.push(move)
                 print(f"Move {board.move_number}: {move_usi}")
@@ -69,35 +74,53 @@ def main():
     print("Enter 'moves' to show legal moves")
     print()
     
+    # Bind hot module attributes to locals once
+    BLACK = shogi.BLACK
+    legal = board.legal_moves
+    
+    # Legal moves and board rendering of the current position,
+    # regenerated only after push/pop
+    cached_legal = None
+    cached_kif = None
+    dirty = True
+    
     while not board.is_game_over():
-        print(f"Turn: {'Black' if board.turn == shogi.BLACK else 'White'}")
-        print(board.kif_str())
+        print(f"Turn: {'Black' if board.turn == BLACK else 'White'}")
+        if dirty:
+            cached_kif = board.kif_str()
+            dirty = False
+            print(cached_kif)
         
         user_input = input("Enter move (USI format): ").strip()
+        if cached_legal is None:
+            cached_legal = list(legal)
         
         if user_input.lower() == 'quit':
             break
         elif user_input.lower() == 'undo':
             if board.move_number > 1:
                 last_move = board.pop()
+                cached_legal = None
+                dirty = True
                 print(f"Undid move: {last_move.usi()}")
             else:
                 print("No moves to undo")
         elif user_input.lower() == 'show':
-            print(board.kif_str())
+            print(cached_kif)
         elif user_input.lower() == 'moves':
-            legal_moves = list(board.legal_moves)
-            print(f"Legal moves ({len(legal_moves)}):")
-            for i, move in enumerate(legal_moves):
+            print(f"Legal moves ({len(cached_legal)}):")
+            for i, move in enumerate(cached_legal):
                 if i % 10 == 0 and i > 0:
                     print()
                 print(f"{move.usi():>6}", end=" ")
             print()
         else:
             try:
-                move = shogi.Move.from_usi(user_input)
-                if move in board.legal_moves:
+                move = from_usi(user_input)
+                if move in cached_legal:
                     board.push(move)
+                    cached_legal = None
+                    dirty = True
                     print(f"Played: {move.usi()}")
                 else:
                     print(f"Invalid move: {user_input}")
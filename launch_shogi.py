@@ -5,8 +5,7 @@ Launcher script for the Python Shogi game.
 Allows you to choose between console and GUI versions.
 """
 
-import sys
-import os
+import importlib
 
 def main():
     print("=== Python Shogi Game Launcher ===\n")
@@ -22,11 +21,11 @@ def main():
             
             if choice == '1':
                 print("\nStarting console version...")
-                os.system("python example_game.py")
+                importlib.import_module("example_game").main()
                 break
             elif choice == '2':
                 print("\nStarting enhanced GUI version...")
-                os.system("python shogi_gui_enhanced.py")
+                importlib.import_module("shogi_gui_enhanced").main()
                 break
             elif choice == '3':
                 print("Goodbye!")
@@ -7,8 +7,14 @@ Now supports Human vs Human, Human vs AI, and AI vs AI modes.
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-import shogi_gui_enhanced
+from tkinter import ttk
+
+# (label, description, mode) for each entry of the mode selection dialog
+GAME_MODES = (
+    ("🤖 Human vs AI", "Play against an intelligent computer opponent", "human_vs_ai"),
+    ("👥 Human vs Human", "Two players take turns on the same computer", "human_vs_human"),
+    ("🤖🤖 AI vs AI", "Watch two AIs (different heuristics) fight optimally", "ai_vs_ai"),
+)
 
 def show_mode_selection():
     """Show mode selection dialog"""
@@ -31,32 +37,13 @@ def show_mode_selection():
     mode_frame = ttk.LabelFrame(main_frame, text="Select Game Mode", padding="15")
     mode_frame.pack(fill=tk.X, pady=(0, 20))
 
-    # Human vs AI
-    human_vs_ai_frame = ttk.Frame(mode_frame)
-    human_vs_ai_frame.pack(fill=tk.X, pady=5)
-    ttk.Label(human_vs_ai_frame, text="🤖 Human vs AI", font=('Arial', 12, 'bold')).pack(anchor=tk.W)
-    ttk.Label(human_vs_ai_frame, text="Play against an intelligent computer opponent", 
-              font=('Arial', 9), foreground='gray').pack(anchor=tk.W)
-    ttk.Button(human_vs_ai_frame, text="Start Game", 
-               command=lambda: start_game(root, "human_vs_ai")).pack(anchor=tk.E, pady=(5, 0))
-
-    # Human vs Human
-    human_vs_human_frame = ttk.Frame(mode_frame)
-    human_vs_human_frame.pack(fill=tk.X, pady=5)
-    ttk.Label(human_vs_human_frame, text="👥 Human vs Human", font=('Arial', 12, 'bold')).pack(anchor=tk.W)
-    ttk.Label(human_vs_human_frame, text="Two players take turns on the same computer", 
-              font=('Arial', 9), foreground='gray').pack(anchor=tk.W)
-    ttk.Button(human_vs_human_frame, text="Start Game", 
-               command=lambda: start_game(root, "human_vs_human")).pack(anchor=tk.E, pady=(5, 0))
-
-    # AI vs AI
-    ai_vs_ai_frame = ttk.Frame(mode_frame)
-    ai_vs_ai_frame.pack(fill=tk.X, pady=5)
-    ttk.Label(ai_vs_ai_frame, text="🤖🤖 AI vs AI", font=('Arial', 12, 'bold')).pack(anchor=tk.W)
-    ttk.Label(ai_vs_ai_frame, text="Watch two AIs (different heuristics) fight optimally", 
-              font=('Arial', 9), foreground='gray').pack(anchor=tk.W)
-    ttk.Button(ai_vs_ai_frame, text="Start Game", 
-               command=lambda: start_game(root, "ai_vs_ai")).pack(anchor=tk.E, pady=(5, 0))
+    for label, description, mode in GAME_MODES:
+        frame = ttk.Frame(mode_frame)
+        frame.pack(fill=tk.X, pady=5)
+        ttk.Label(frame, text=label, font=('Arial', 12, 'bold')).pack(anchor=tk.W)
+        ttk.Label(frame, text=description, font=('Arial', 9), foreground='gray').pack(anchor=tk.W)
+        ttk.Button(frame, text="Start Game",
+                   command=lambda m=mode: start_game(root, m)).pack(anchor=tk.E, pady=(5, 0))
 
     features_frame = ttk.LabelFrame(main_frame, text="Features", padding="15")
     features_frame.pack(fill=tk.BOTH, expand=True)
@@ -73,6 +60,9 @@ def show_mode_selection():
 
 def start_game(parent, mode):
     """Start the game with the selected mode"""
+    # Imported lazily so the launcher (and its Exit path) doesn't load the GUI and AI
+    import shogi_gui_enhanced
+
     parent.destroy()
     root = tk.Tk()
     app = shogi_gui_enhanced.EnhancedShogiGUI(root)
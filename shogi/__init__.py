@@ -520,6 +520,15 @@ class Occupied(object):
             return self.by_color[key]
         raise KeyError("Occupied must be looked up with shogi.BLACK or shogi.WHITE")
 
+    def copy(self):
+        occupied = Occupied.__new__(Occupied)
+        occupied.by_color = list(self.by_color)
+        occupied.bits = self.bits
+        occupied.l45 = self.l45
+        occupied.r45 = self.r45
+        occupied.l90 = self.l90
+        return occupied
+
     def ixor(self, mask, color, square):
         self.bits ^= mask
         self.by_color[color] ^= mask
@@ -600,6 +609,7 @@ class Board(object):
         self.move_number = 1
         self.captured_piece_stack = collections.deque()
         self.move_stack = collections.deque()
+        self.zobrist_stack = collections.deque()
         self.incremental_zobrist_hash = self.board_zobrist_hash(DEFAULT_RANDOM_ARRAY)
         self.transpositions = collections.Counter((self.zobrist_hash(),))
 
@@ -633,9 +643,37 @@ class Board(object):
         self.move_number = 1
         self.captured_piece_stack = collections.deque()
         self.move_stack = collections.deque()
+        self.zobrist_stack = collections.deque()
         self.incremental_zobrist_hash = self.board_zobrist_hash(DEFAULT_RANDOM_ARRAY)
         self.transpositions = collections.Counter((self.zobrist_hash(),))
 
+    def copy(self):
+        """
+        Returns an independent copy of the board, including the move stack
+        and repetition counts, so the copy can be pushed and popped freely.
+        Much cheaper than `copy.deepcopy`, which also walks the move
+        generators and every stacked move.
+        """
+        board = type(self).__new__(type(self))
+        board.pseudo_legal_moves = PseudoLegalMoveGenerator(board)
+        board.legal_moves = LegalMoveGenerator(board)
+
+        board.piece_bb = list(self.piece_bb)
+        board.pieces_in_hand = [collections.Counter(hand) for hand in self.pieces_in_hand]
+        board.occupied = self.occupied.copy()
+        board.king_squares = list(self.king_squares)
+        board.pieces = list(self.pieces)
+
+        board.turn = self.turn
+        board.move_number = self.move_number
+        # Moves are never mutated once made, so the stacks can share them.
+        board.captured_piece_stack = collections.deque(self.captured_piece_stack)
+        board.move_stack = collections.deque(self.move_stack)
+        board.zobrist_stack = collections.deque(self.zobrist_stack)
+        board.incremental_zobrist_hash = self.incremental_zobrist_hash
+        board.transpositions = collections.Counter(self.transpositions)
+        return board
+
     def piece_at(self, square):
         """Gets the piece at the given square."""
         mask = BB_SQUARES[square]
@@ -1169,8 +1207,10 @@ class Board(object):
         # Swap turn.
         self.turn ^= 1
 
-        # Update transposition table.
-        self.transpositions.update((self.zobrist_hash(),))
+        # Update transposition table, remembering the hash for pop().
+        zobrist_hash = self.zobrist_hash()
+        self.zobrist_stack.append(zobrist_hash)
+        self.transpositions.update((zobrist_hash,))
 
     def pop(self):
         """
@@ -1178,8 +1218,9 @@ class Board(object):
         """
         move = self.move_stack.pop()
 
-        # Update transposition table.
-        self.transpositions.subtract((self.zobrist_hash(),))
+        # Update transposition table. Null moves were never counted.
+        if move:
+            self.transpositions.subtract((self.zobrist_stack.pop(),))
 
         # Decrement move number.
         self.move_number -= 1
@@ -7,13 +7,91 @@ Now supports configurable fuzzy profiles to create different AI "styles".
 """
 
 import shogi
+import heapq
 import random
 import time
+from collections import deque, namedtuple
 from typing import List, Tuple, Optional, Dict
 import math
 
 Matrix = List[List[float]]
 
+# Transposition table entry; value is exact or a lower/upper bound depending on flag
+TTEntry = namedtuple('TTEntry', ['key', 'depth', 'value', 'flag', 'best_move', 'age'])
+TT_EXACT, TT_LOWER, TT_UPPER = range(3)
+
+_INF = float('inf')
+_NINF = -_INF
+
+# Number of transposition table slots; must be a power of two
+TT_SIZE = 1 << 18
+
+# Flat piece codes: piece_type | (color << 4), 0 marks an empty square
+WHITE_CODE_BIT = 1 << 4
+NUM_PIECE_CODES = 32
+
+# Deepest ply tracked by the killer-move table
+MAX_PLY = 64
+
+# Maximum number of capture plies searched past the nominal depth
+QUIESCENCE_DEPTH = 6
+
+# Null-move pruning: depth reduction and minimum remaining depth to try it
+NULL_MOVE_R = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Width of the null-move probe's window (beta - NULL_WINDOW, beta); well below
+# the eval's resolution, but non-zero so the probe's subtree stores valid bounds
+NULL_WINDOW = 0.001
+
+# Move lists longer than this only have their best PARTIAL_SORT_K moves sorted
+PARTIAL_SORT_K = 12
+
+# Number of most recent played positions remembered for repetition penalties
+POSITION_HISTORY_SIZE = 128
+
+# Half-width of the aspiration window around the previous iteration's score (half a pawn)
+ASPIRATION_WINDOW = 0.5
+
+# The clock is read once every TIME_CHECK_INTERVAL nodes (a power of two).
+# Leaf evaluation costs milliseconds, so this stays small.
+TIME_CHECK_INTERVAL = 16
+
+class _TimeUp(Exception):
+    """Raised inside the search once the move deadline has passed."""
+
+def piece_code(piece_type: int, color: int) -> int:
+    """Pack a piece type and color into a single small int."""
+    return piece_type | (color << 4)
+
+# Column (0 = file 9) and rank (0 = rank a) of every square, in place of % 9 and // 9
+_FILE = tuple(sq % 9 for sq in range(81))
+_RANK = tuple(sq // 9 for sq in range(81))
+
+# Per-square scalars used by evaluation and move ordering
+# Pawn advancement bonus by color, in tenths: half a point per rank advanced
+_PAWN_ADVANCE = (tuple((8 - r) * 5 for r in _RANK), tuple(r * 5 for r in _RANK))
+# Ordering bonus for moving a non-king piece into the central 3x3 block
+_CENTER_MOVE_BONUS = tuple(30 if 3 <= r <= 5 and 3 <= c <= 5 else 0 for r, c in zip(_RANK, _FILE))
+# Ordering bonus for a drop by color: +100 in the central 5x5, +150 near the enemy camp
+_DROP_SQUARE_BONUS = tuple(
+    tuple((100 if 2 <= r <= 6 and 2 <= c <= 6 else 0) +
+          (150 if (r <= 3 if color == 0 else r >= 5) else 0)
+          for r, c in zip(_RANK, _FILE))
+    for color in (0, 1)
+)
+
+# Central 3x3 block rewarded for occupation
+CENTER_SQUARES = frozenset([36, 37, 38, 45, 46, 47, 54, 55, 56])
+
+# On-board neighbours of every square, used for king exposure
+KING_NEIGHBOURS = [
+    [nr * 9 + nc
+     for nr in range(_RANK[sq] - 1, _RANK[sq] + 2)
+     for nc in range(_FILE[sq] - 1, _FILE[sq] + 2)
+     if 0 <= nr < 9 and 0 <= nc < 9 and (nr, nc) != (_RANK[sq], _FILE[sq])]
+    for sq in range(81)
+]
+
 def mirror_vertical(mat: Matrix) -> Matrix:
     """Mirror a 9x9 matrix vertically (for opposite side)."""
     return [row[:] for row in mat[::-1]]
@@ -22,6 +100,9 @@ def make_uniform(value: float) -> Matrix:
     """Return 9x9 filled matrix with value."""
     return [[value for _ in range(9)] for _ in range(9)]
 
+# Weight names matching the order of FuzzyProfile.stack_by_color
+FUZZY_WEIGHT_KEYS = ("w_center", "w_flanks", "w_promo", "w_kings", "w_drop")
+
 class FuzzyProfile:
     """
     Holds fuzzy arrays and weights for a particular AI agent.
@@ -41,6 +122,16 @@ class FuzzyProfile:
         self.king_safety = king_safety
         self.drop_potential_black = drop_potential_black
         self.drop_potential_white = mirror_vertical(drop_potential_black)
+        self.center_white = mirror_vertical(center)
+        self.flanks_white = mirror_vertical(flanks)
+        self.king_safety_white = mirror_vertical(king_safety)
+        # The five matrices as seen by each color, in FUZZY_WEIGHT_KEYS order,
+        # so evaluation never has to mirror ranks itself
+        self.stack_by_color = (
+            (center, flanks, promotion_black, king_safety, drop_potential_black),
+            (self.center_white, self.flanks_white, self.promotion_white,
+             self.king_safety_white, self.drop_potential_white),
+        )
         self.weights = weights or {
             "w_center": 0.4,
             "w_flanks": 0.1,
@@ -49,60 +140,55 @@ class FuzzyProfile:
             "w_drop": 0.15
         }
 
+# Default fuzzy matrices, built once at import and shared by every profile
+
+# Center emphasis
+_CENTER = (
+    (0,0,0.1,0.2,0.25,0.2,0.1,0,0),
+    (0,0.1,0.25,0.5,0.6,0.5,0.25,0.1,0),
+    (0.1,0.25,0.6,0.8,1.0,0.8,0.6,0.25,0.1),
+    (0.2,0.5,0.8,1.0,1.0,1.0,0.8,0.5,0.2),
+    (0.25,0.6,1.0,1.0,1.0,1.0,1.0,0.6,0.25),
+    (0.2,0.5,0.8,1.0,1.0,1.0,0.8,0.5,0.2),
+    (0.1,0.25,0.6,0.8,1.0,0.8,0.6,0.25,0.1),
+    (0,0.1,0.25,0.5,0.6,0.5,0.25,0.1,0),
+    (0,0,0.1,0.2,0.25,0.2,0.1,0,0),
+)
+# Flank emphasis: 1.0 on files 1 & 9, decays toward center
+_FLANKS = ((1.0,0.75,0.5,0.25,0,0.25,0.5,0.75,1.0),) * 9
+
+# Promotion potential (for Black, bottom-to-top orientation)
+_PROMOTION_BLACK = tuple((v,) * 9 for v in (0.5, 0.75, 1.0, 1.0, 0.8, 0.6, 0.4, 0.2, 0.1))
+
+# King safety: safer near corners/back ranks for both sides
+_KING_SAFETY = (
+    (0.8,0.9,1.0,0.7,0.4,0.4,0.7,1.0,0.9),
+    (0.7,0.8,0.9,0.6,0.3,0.3,0.6,0.9,0.8),
+    (0.5,0.6,0.7,0.5,0.3,0.3,0.5,0.7,0.6),
+    (0.2,0.3,0.4,0.3,0.2,0.2,0.3,0.4,0.3),
+    (0.1,0.2,0.2,0.2,0.1,0.2,0.2,0.2,0.1),
+    (0.2,0.3,0.4,0.3,0.2,0.2,0.3,0.4,0.3),
+    (0.5,0.6,0.7,0.5,0.3,0.3,0.5,0.7,0.6),
+    (0.7,0.8,0.9,0.6,0.3,0.3,0.6,0.9,0.8),
+    (0.8,0.9,1.0,0.7,0.4,0.4,0.7,1.0,0.9),
+)
+# Drop potential for Black: high in enemy territory center
+_DROP_BLACK = (
+    (0.6,0.7,0.8,0.9,1.0,0.9,0.8,0.7,0.6),
+    (0.6,0.7,0.85,0.95,1.0,0.95,0.85,0.7,0.6),
+    (0.5,0.6,0.8,0.9,0.95,0.9,0.8,0.6,0.5),
+    (0.4,0.6,0.75,0.85,0.9,0.85,0.75,0.6,0.4),
+    (0.3,0.5,0.7,0.8,0.85,0.8,0.7,0.5,0.3),
+    (0.25,0.4,0.6,0.7,0.75,0.7,0.6,0.4,0.25),
+    (0.2,0.35,0.5,0.6,0.65,0.6,0.5,0.35,0.2),
+    (0.15,0.3,0.45,0.55,0.6,0.55,0.45,0.3,0.15),
+    (0.1,0.2,0.3,0.4,0.45,0.4,0.3,0.2,0.1),
+)
+
 def default_fuzzy_profiles():
     """Create two example profiles with different strategic biases."""
-    # Center emphasis
-    center = [
-        [0,0,0.1,0.2,0.25,0.2,0.1,0,0],
-        [0,0.1,0.25,0.5,0.6,0.5,0.25,0.1,0],
-        [0.1,0.25,0.6,0.8,1.0,0.8,0.6,0.25,0.1],
-        [0.2,0.5,0.8,1.0,1.0,1.0,0.8,0.5,0.2],
-        [0.25,0.6,1.0,1.0,1.0,1.0,1.0,0.6,0.25],
-        [0.2,0.5,0.8,1.0,1.0,1.0,0.8,0.5,0.2],
-        [0.1,0.25,0.6,0.8,1.0,0.8,0.6,0.25,0.1],
-        [0,0.1,0.25,0.5,0.6,0.5,0.25,0.1,0],
-        [0,0,0.1,0.2,0.25,0.2,0.1,0,0],
-    ]
-    # Flank emphasis: 1.0 on files 1 & 9, decays toward center
-    flank_row = [1.0,0.75,0.5,0.25,0,0.25,0.5,0.75,1.0]
-    flanks = [flank_row[:] for _ in range(9)]
-
-    # Promotion potential (for Black, bottom-to-top orientation)
-    promotion_black = [
-        [0.5]*9,
-        [0.75]*9,
-        [1.0]*9,
-        [1.0]*9,
-        [0.8]*9,
-        [0.6]*9,
-        [0.4]*9,
-        [0.2]*9,
-        [0.1]*9,
-    ]
-    # King safety: safer near corners/back ranks for both sides
-    king_safety = [
-        [0.8,0.9,1.0,0.7,0.4,0.4,0.7,1.0,0.9],
-        [0.7,0.8,0.9,0.6,0.3,0.3,0.6,0.9,0.8],
-        [0.5,0.6,0.7,0.5,0.3,0.3,0.5,0.7,0.6],
-        [0.2,0.3,0.4,0.3,0.2,0.2,0.3,0.4,0.3],
-        [0.1,0.2,0.2,0.2,0.1,0.2,0.2,0.2,0.1],
-        [0.2,0.3,0.4,0.3,0.2,0.2,0.3,0.4,0.3],
-        [0.5,0.6,0.7,0.5,0.3,0.3,0.5,0.7,0.6],
-        [0.7,0.8,0.9,0.6,0.3,0.3,0.6,0.9,0.8],
-        [0.8,0.9,1.0,0.7,0.4,0.4,0.7,1.0,0.9],
-    ]
-    # Drop potential for Black: high in enemy territory center
-    drop_black = [
-        [0.6,0.7,0.8,0.9,1.0,0.9,0.8,0.7,0.6],
-        [0.6,0.7,0.85,0.95,1.0,0.95,0.85,0.7,0.6],
-        [0.5,0.6,0.8,0.9,0.95,0.9,0.8,0.6,0.5],
-        [0.4,0.6,0.75,0.85,0.9,0.85,0.75,0.6,0.4],
-        [0.3,0.5,0.7,0.8,0.85,0.8,0.7,0.5,0.3],
-        [0.25,0.4,0.6,0.7,0.75,0.7,0.6,0.4,0.25],
-        [0.2,0.35,0.5,0.6,0.65,0.6,0.5,0.35,0.2],
-        [0.15,0.3,0.45,0.55,0.6,0.55,0.45,0.3,0.15],
-        [0.1,0.2,0.3,0.4,0.45,0.4,0.3,0.2,0.1],
-    ]
+    center, flanks = _CENTER, _FLANKS
+    promotion_black, king_safety, drop_black = _PROMOTION_BLACK, _KING_SAFETY, _DROP_BLACK
 
     # Profile A: Aggressive Centralist (still aggressive but values king safety more)
     profile_a = FuzzyProfile(center=center,
@@ -121,16 +207,64 @@ def default_fuzzy_profiles():
                              weights={"w_center":0.15,"w_flanks":0.3,"w_promo":0.15,"w_kings":0.3,"w_drop":0.1})
     return profile_a, profile_b
 
+class TranspositionTable:
+    """
+    Fixed-size table of TTEntry indexed by the low bits of the Zobrist key.
+    Each bucket has two slots: a depth-preferred one and an always-replace one.
+    Keys are kept in a parallel list so a probe compares ints without touching
+    the entry. Entries persist across searches; those left over from earlier
+    moves (older age) lose their depth preference.
+    """
+    def __init__(self, size: int = TT_SIZE):
+        if size < 2 or size & (size - 1):
+            raise ValueError("transposition table size must be a power of two: {0}".format(size))
+        self.mask = (size - 1) & ~1
+        self.keys = [None] * size
+        self.slots = [None] * size
+        self.age = 0
+
+    def new_search(self):
+        """Mark a new root move so entries from previous searches age out."""
+        self.age += 1
+
+    def get(self, key: int) -> Optional[TTEntry]:
+        idx = key & self.mask
+        keys = self.keys
+        if keys[idx] == key:
+            return self.slots[idx]
+        if keys[idx + 1] == key:
+            return self.slots[idx + 1]
+        return None
+
+    def store(self, key: int, depth: int, value: float, flag: int, best_move: Optional[shogi.Move]):
+        idx = key & self.mask
+        stored = self.keys[idx]
+        if stored is not None and stored != key:
+            deep = self.slots[idx]
+            if deep.age == self.age and deep.depth > depth:
+                idx += 1
+        self.keys[idx] = key
+        self.slots[idx] = TTEntry(key, depth, value, flag, best_move, self.age)
+
+    def clear(self):
+        self.keys = [None] * len(self.keys)
+        self.slots = [None] * len(self.slots)
+        self.age = 0
+
 class ShogiAI:
     def __init__(self, depth: int = 3, time_limit: float = 5.0, fuzzy: FuzzyProfile = None):
         self.depth = depth
         self.time_limit = time_limit
         self.nodes_evaluated = 0
-        self.transposition_table = {}
+        self._deadline = _INF
+        self._stopped = False  # set from another thread by stop()
+        self.transposition_table = TranspositionTable()
         self.fuzzy = fuzzy or default_fuzzy_profiles()[0]  # default A
         
-        # Position history for repetition detection
+        # Position history for repetition detection, keyed by Zobrist hash;
+        # the ring holds the same keys in play order so the oldest can expire
         self.position_history = {}
+        self._position_ring = deque(maxlen=POSITION_HISTORY_SIZE)
         self.move_count = 0
 
         # Material values
@@ -144,23 +278,43 @@ class ShogiAI:
         # Basic positional tables retained for piece-type flavor
         self.positional_values = self._initialize_positional_values()
 
-<<<<<<< Updated upstream
-=======
+        # Material by piece type as a flat list (index 0 = no piece)
+        self._piece_value_arr = [0] * NUM_PIECE_CODES
+        for pt, value in self.piece_values.items():
+            self._piece_value_arr[pt] = value
+        # Pieces in hand count half their board value, kept in tenths for the eval
+        self._hand_value_tenths = [value * 5 for value in self._piece_value_arr]
+
+        # Per-code lookup tables with signs baked in (Black positive, White negative)
+        self._piece_code_values, self._positional_lut = self._build_piece_code_tables()
+
+        # Fuzzy bonus per square, recomputed whenever the profile changes
+        self._fuzzy_grids, self._king_fuzzy_grid = self._build_fuzzy_grids()
+        self._piece_square_table = self._build_piece_square_table()
+
+        # Move-ordering heuristics fed by beta cutoffs: two killer moves per ply
+        # and a history score per (piece code, destination square)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 81 for _ in range(NUM_PIECE_CODES)]
+
+        # One reusable move list per ply so the search does not allocate a
+        # fresh list at every node
+        self._move_buffers = [[] for _ in range(MAX_PLY)]
+
     def _penalize_king_center_moves(self, board: shogi.Board, move: shogi.Move) -> float:
         """Apply penalty for moving king toward center early in game"""
         if move.from_square is None:
             return 0.0
             
-        moving_piece = board.piece_at(move.from_square)
-        if not moving_piece or moving_piece.piece_type != shogi.KING:
+        if board.pieces[move.from_square] != shogi.KING:
             return 0.0
         
         # Apply penalty throughout early-mid game
         if board.move_number > 25:
             return 0.0
             
-        to_r = move.to_square // 9
-        to_c = move.to_square % 9
+        to_r = _RANK[move.to_square]
+        to_c = _FILE[move.to_square]
         
         # Very heavy penalty for moving king to center (files 3-5, ranks 3-5)
         if 3 <= to_r <= 5 and 3 <= to_c <= 5:
@@ -171,8 +325,8 @@ class ShogiAI:
             return -200  # Penalty for moving near center
         
         # Penalty for moving closer to center
-        from_r = move.from_square // 9
-        from_c = move.from_square % 9
+        from_r = _RANK[move.from_square]
+        from_c = _FILE[move.from_square]
         
         center_r, center_c = 4, 4
         old_distance = abs(from_r - center_r) + abs(from_c - center_c)
@@ -271,8 +425,11 @@ class ShogiAI:
         else:
             return (0.7 - threat) / 0.4
 
-    def _calculate_king_exposure(self, board: shogi.Board, king_r: int, king_c: int, color: int) -> float:
+    def _calculate_king_exposure(self, board: shogi.Board, king_r: int, king_c: int, color: int,
+                                 codes: Optional[List[int]] = None) -> float:
         """Calculate how exposed the king is (0-1 scale, higher = more exposed)"""
+        if codes is None:
+            codes = self._board_to_array(board)
         exposure = 0.0
         
         # Check adjacent squares for piece protection
@@ -286,9 +443,8 @@ class ShogiAI:
                 nr, nc = king_r + dr, king_c + dc
                 if 0 <= nr < 9 and 0 <= nc < 9:
                     total_adjacent += 1
-                    sq = nr * 9 + nc
-                    piece = board.piece_at(sq)
-                    if piece and piece.color == color:
+                    code = codes[nr * 9 + nc]
+                    if code and code >> 4 == color:
                         protected_squares += 1
         
         # Exposure based on lack of friendly pieces nearby
@@ -297,11 +453,10 @@ class ShogiAI:
         
         # Check for enemy attacks on king area
         enemy_attacks = 0
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece and piece.color != color:
+        for sq, code in enumerate(codes):
+            if code and code >> 4 != color:
                 # Check if this piece can attack king's area
-                pr, pc = sq // 9, sq % 9
+                pr, pc = _RANK[sq], _FILE[sq]
                 distance = max(abs(pr - king_r), abs(pc - king_c))
                 if distance <= 2:  # Within 2 squares
                     enemy_attacks += 1
@@ -313,7 +468,12 @@ class ShogiAI:
             exposure += 0.3
         
         return min(1.0, exposure)
+
+    def _calculate_threat_level(self, board: shogi.Board, king_r: int, king_c: int, color: int,
+                                codes: Optional[List[int]] = None) -> float:
         """Calculate opponent threat level near the king position (0-1 scale)"""
+        if codes is None:
+            codes = self._board_to_array(board)
         opponent_color = shogi.WHITE if color == shogi.BLACK else shogi.BLACK
         threat_count = 0
         max_threat = 5  # Normalize to max 5 threatening pieces
@@ -323,45 +483,16 @@ class ShogiAI:
             for dc in [-1, 0, 1]:
                 nr, nc = king_r + dr, king_c + dc
                 if 0 <= nr < 9 and 0 <= nc < 9:
-                    sq = nr * 9 + nc
-                    piece = board.piece_at(sq)
-                    if piece and piece.color == opponent_color:
-                        # Weight by piece value (higher value = higher threat)
-                        threat_count += min(1, self.piece_values.get(piece.piece_type, 0) / 10)
-        
-        # Also check for long-range threats (rooks, bishops, lances)
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece and piece.color == opponent_color and piece.piece_type in [shogi.ROOK, shogi.BISHOP, shogi.LANCE]:
-                # Simplified: if piece can potentially attack king area
-                pr, pc = sq // 9, sq % 9
-                distance = abs(pr - king_r) + abs(pc - king_c)
-                if distance <= 4:  # Within attacking range
-                    threat_count += 0.5
-        
-    def _calculate_threat_level(self, board: shogi.Board, king_r: int, king_c: int, color: int) -> float:
-        """Calculate opponent threat level near the king position (0-1 scale)"""
-        opponent_color = shogi.WHITE if color == shogi.BLACK else shogi.BLACK
-        threat_count = 0
-        max_threat = 5  # Normalize to max 5 threatening pieces
-        
-        # Check squares around king (3x3 area)
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                nr, nc = king_r + dr, king_c + dc
-                if 0 <= nr < 9 and 0 <= nc < 9:
-                    sq = nr * 9 + nc
-                    piece = board.piece_at(sq)
-                    if piece and piece.color == opponent_color:
+                    code = codes[nr * 9 + nc]
+                    if code and code >> 4 == opponent_color:
                         # Weight by piece value (higher value = higher threat)
-                        threat_count += min(1, self.piece_values.get(piece.piece_type, 0) / 10)
+                        threat_count += min(1, self._piece_value_arr[code & ~WHITE_CODE_BIT] / 10)
         
         # Also check for long-range threats (rooks, bishops, lances)
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece and piece.color == opponent_color and piece.piece_type in [shogi.ROOK, shogi.BISHOP, shogi.LANCE]:
+        for sq, code in enumerate(codes):
+            if code and code >> 4 == opponent_color and code & ~WHITE_CODE_BIT in (shogi.ROOK, shogi.BISHOP, shogi.LANCE):
                 # Simplified: if piece can potentially attack king area
-                pr, pc = sq // 9, sq % 9
+                pr, pc = _RANK[sq], _FILE[sq]
                 distance = abs(pr - king_r) + abs(pc - king_c)
                 if distance <= 4:  # Within attacking range
                     threat_count += 0.5
@@ -378,19 +509,18 @@ class ShogiAI:
         best_castle = None
         best_score = -999
         
+        # Snapshot the board once for all patterns and helpers
+        codes = self._board_to_array(board)
+
         # Find current king position
-        king_sq = None
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece and piece.piece_type == shogi.KING and piece.color == color:
-                king_sq = sq
-                break
+        king_code = piece_code(shogi.KING, color)
+        king_sq = codes.index(king_code) if king_code in codes else None
         
         if king_sq is None:
             return None, 0.0
             
-        current_king_r = king_sq // 9
-        current_king_c = king_sq % 9
+        current_king_r = _RANK[king_sq]
+        current_king_c = _FILE[king_sq]
         
         for pattern_name in patterns:
             pattern = self.castle_patterns[pattern_name]
@@ -400,19 +530,17 @@ class ShogiAI:
             king_r, king_c = pattern.king_pos
             
             # Calculate fuzzy metrics using current king position for exposure
-            exposure = self._calculate_king_exposure(board, current_king_r, current_king_c, color)
+            exposure = self._calculate_king_exposure(board, current_king_r, current_king_c, color, codes)
             
             # Piece support (completion ratio)
             completion = 0
             for piece_type, req_r, req_c in pattern.pieces:
-                sq = req_r * 9 + req_c
-                piece = board.piece_at(sq)
-                if piece and piece.piece_type == piece_type and piece.color == color:
+                if codes[req_r * 9 + req_c] == piece_code(piece_type, color):
                     completion += 1
             support = completion / len(pattern.pieces)
             
             # Opponent threat level around target castle position
-            threat = self._calculate_threat_level(board, king_r, king_c, color)
+            threat = self._calculate_threat_level(board, king_r, king_c, color, codes)
             
             # Fuzzy rule evaluation for each castle type
             fuzzy_score = 0.0
@@ -460,19 +588,59 @@ class ShogiAI:
         pattern = self.castle_patterns[pattern_name]
         color = shogi.BLACK if 'black' in pattern_name else shogi.WHITE
         
+        pieces = board.pieces
+        white = board.occupied[shogi.WHITE]
         completion = 0
         for piece_type, req_r, req_c in pattern.pieces:
             sq = req_r * 9 + req_c
-            piece = board.piece_at(sq)
-            if piece and piece.piece_type == piece_type and piece.color == color:
+            if pieces[sq] == piece_type and (white >> sq & 1) == color:
                 completion += 1
         
         return completion / len(pattern.pieces)
 
 
->>>>>>> Stashed changes
     def set_fuzzy_profile(self, fuzzy: FuzzyProfile):
         self.fuzzy = fuzzy
+        self._fuzzy_grids, self._king_fuzzy_grid = self._build_fuzzy_grids()
+        self._piece_square_table = self._build_piece_square_table()
+
+    def _build_piece_square_table(self) -> List[List[float]]:
+        """
+        Signed per-square score of every piece code: material, positional
+        table, fuzzy bonus (king-safety grid for kings) and center control.
+        """
+        table = [[0.0] * 81 for _ in range(NUM_PIECE_CODES)]
+        for pt in shogi.PIECE_TYPES:
+            for color in shogi.COLORS:
+                code = piece_code(pt, color)
+                base = self._piece_code_values[code]
+                positional = self._positional_lut[code]
+                fuzzy = self._king_fuzzy_grid if pt == shogi.KING else self._fuzzy_grids[color]
+                center = 0.5 if color == shogi.BLACK else -0.5
+                row = table[code]
+                for sq in range(81):
+                    row[sq] = base + positional[sq] + base * 0.1 * fuzzy[sq]  # Increased fuzzy influence
+                    if sq in CENTER_SQUARES:
+                        row[sq] += center
+        return table
+
+    def _build_fuzzy_grids(self) -> Tuple[List[List[float]], List[float]]:
+        """
+        Weighted fuzzy bonus of every square for each color's pieces, and the
+        bonus used for kings (king safety only, penalising exposed squares).
+        """
+        fz = self.fuzzy
+        weights = [fz.weights[k] for k in FUZZY_WEIGHT_KEYS]
+        w_kings = fz.weights["w_kings"]
+        grids = [[0.0] * 81 for _ in shogi.COLORS]
+        king_grid = [0.0] * 81
+        for sq in range(81):
+            r, c = _RANK[sq], _FILE[sq]
+            for color in shogi.COLORS:
+                grids[color][sq] = sum(wt * m[r][c] for wt, m in zip(weights, fz.stack_by_color[color]))
+            f_king = fz.king_safety[r][c]
+            king_grid[sq] = w_kings*f_king - (1.0 - f_king) * 3.0
+        return grids, king_grid
 
     def _initialize_positional_values(self) -> dict:
         tables = {}
@@ -524,311 +692,412 @@ class ShogiAI:
 
     def get_best_move(self, board: shogi.Board) -> Optional[shogi.Move]:
         self.nodes_evaluated = 0
-        start = time.time()
+        self._deadline = time.time() + self.time_limit
+        self._age_move_ordering()
+        self.transposition_table.new_search()
         legal = list(board.legal_moves)
         if not legal:
             return None
         if len(legal) == 1:
             # Update position history even for forced moves
-            pos_key = str(board)
-            self.position_history[pos_key] = self.position_history.get(pos_key, 0) + 1
+            self._record_position(board.zobrist_hash())
             return legal[0]
 
-        # Track current position
-        current_pos = str(board)
-        
-        legal = self._order_moves(board, legal)
+        # Shuffle before the stable ordering so equally rated moves vary between games.
+        # The table survives between moves, so an earlier search may already
+        # have stored a best move for this position; try it first.
+        random.shuffle(legal)
+        entry = self.transposition_table.get(board.zobrist_hash())
+        legal = self._order_moves(board, legal, entry.best_move if entry is not None else None)
         best_move = None
-        best_score = float('-inf') if board.turn == shogi.BLACK else float('inf')
+        best_score = None
 
-        # Iterative deepening
+        # Iterative deepening; root scores are from the side to move's point of view
+        side_sign = 1 if board.turn == shogi.BLACK else -1
+        root_ply = len(board.move_stack)
         for d in range(1, self.depth + 1):
-            if time.time() - start > self.time_limit:
+            if self._stopped or time.time() > self._deadline:
                 break
+            guess = best_score
+            # Search the previous iteration's best move first
+            if best_move is not None:
+                legal.remove(best_move)
+                legal.insert(0, best_move)
+            # Results only replace best_move once the whole iteration finishes
+            iteration_move = None
+            iteration_score = _NINF
+            completed = True
             for move in legal:
-                if time.time() - start > self.time_limit:
+                if self._stopped:
+                    completed = False
                     break
                 board.push(move)
                 
                 # Check for repetition after move
-                future_pos = str(board)
+                future_pos = board.zobrist_hash()
                 repetition_penalty = 0
                 if future_pos in self.position_history:
                     repetition_penalty = -50 * self.position_history[future_pos]  # Heavy penalty for repetition
                 
-                if d == 1:
-                    score = self._evaluate_position(board) + repetition_penalty
-                else:
-                    score = self._minimax(board, d - 1, float('-inf'), float('inf'), board.turn == shogi.WHITE) + repetition_penalty
+                try:
+                    if d == 1:
+                        score = side_sign * self._evaluate_position(board) + repetition_penalty
+                    else:
+                        score = self._aspiration_search(board, d - 1, guess, iteration_score) + repetition_penalty
+                except _TimeUp:
+                    # Unwind the moves the interrupted search left on the board
+                    while len(board.move_stack) > root_ply:
+                        board.pop()
+                    completed = False
+                    break
                 board.pop()
 
-                if board.turn == shogi.BLACK:
-                    if score > best_score:
-                        best_score, best_move = score, move
-                else:
-                    if score < best_score:
-                        best_score, best_move = score, move
+                if score > iteration_score:
+                    iteration_score, iteration_move = score, move
+
+            if not completed:
+                break
+            best_move, best_score = iteration_move, iteration_score
 
         # Update position history with chosen move
         if best_move:
             board.push(best_move)
-            pos_key = str(board)
-            self.position_history[pos_key] = self.position_history.get(pos_key, 0) + 1
+            self._record_position(board.zobrist_hash())
             board.pop()
-            
-        # Clean old positions from history to prevent memory bloat
         self.move_count += 1
-        if self.move_count % 20 == 0:
-            self._clean_position_history()
 
         return best_move or random.choice(legal)
 
-    def _clean_position_history(self):
-        """Remove old positions from history to prevent memory bloat"""
-        if len(self.position_history) > 100:
-            # Keep only the most recent positions
-            sorted_items = sorted(self.position_history.items(), key=lambda x: x[1], reverse=True)
-            self.position_history = dict(sorted_items[:50])
+    def _aspiration_search(self, board: shogi.Board, depth: int, guess: float, best_so_far: float) -> float:
+        """
+        Score a root move (already pushed) for the root side, searching in a
+        narrow window around the previous iteration's score. A result outside
+        the window is only a bound; it is re-searched with that side opened up
+        unless it is already worse than best_so_far.
+        """
+        if math.isinf(guess):
+            return -self._negamax(board, depth, _NINF, _INF, 1)
+        alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+        score = -self._negamax(board, depth, -beta, -alpha, 1)
+        if score >= beta:
+            score = -self._negamax(board, depth, _NINF, 1 - score, 1)
+        elif score <= alpha and score > best_so_far:
+            score = -self._negamax(board, depth, -score - 1, _INF, 1)
+        return score
 
-    def _minimax(self, board: shogi.Board, depth: int, alpha: float, beta: float, maximizing_white: bool) -> float:
+    def _record_position(self, key: int):
+        """Count a played position, forgetting the oldest one once the ring is full."""
+        ring = self._position_ring
+        if len(ring) == ring.maxlen:
+            oldest = ring[0]  # dropped by the append below
+            count = self.position_history[oldest] - 1
+            if count:
+                self.position_history[oldest] = count
+            else:
+                del self.position_history[oldest]
+        ring.append(key)
+        self.position_history[key] = self.position_history.get(key, 0) + 1
+
+    def _negamax(self, board: shogi.Board, depth: int, alpha: float, beta: float, ply: int = 0) -> float:
+        """Alpha-beta search; the score is from the side to move's point of view."""
         self.nodes_evaluated += 1
-        if depth == 0 or board.is_game_over():
-            return self._evaluate_position(board)
+        if not self.nodes_evaluated % TIME_CHECK_INTERVAL and (self._stopped or time.time() > self._deadline):
+            raise _TimeUp()
+        # Checkmate and stalemate are detected from the move list below, so
+        # only repetition needs checking up front
+        if board.is_fourfold_repetition():
+            return self._eval_signed(board)
+        if depth == 0:
+            return self._quiescence(board, alpha, beta, QUIESCENCE_DEPTH)
 
-        key = hash(str(board))
-        if key in self.transposition_table:
-            return self.transposition_table[key]
+        # python-shogi keeps a Zobrist hash up to date incrementally in push/pop
+        key = board.zobrist_hash()
+        alpha_orig = alpha
+        entry = self.transposition_table.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.best_move
+            if entry.depth >= depth:
+                if entry.flag == TT_EXACT:
+                    return entry.value
+                if entry.flag == TT_LOWER:
+                    alpha = max(alpha, entry.value)
+                else:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return entry.value
 
-        legal = list(board.legal_moves)
-        if not legal:
-            return self._evaluate_position(board)
-
-        legal = self._order_moves(board, legal)
-        if maximizing_white:
-            best = float('-inf')
-            for mv in legal:
-                board.push(mv)
-                val = self._minimax(board, depth-1, alpha, beta, False)
+        # Null-move pruning: if passing still fails high at reduced depth, a real
+        # move will too. Shogi's drops make zugzwang rare, so no endgame guard;
+        # never try it in check or straight after another null move. With beta
+        # at +inf the probe's window would be empty and could never fail high.
+        if (depth >= NULL_MOVE_MIN_DEPTH and beta != _INF
+                and board.move_stack and board.move_stack[-1] and not board.is_check()):
+            board.push(shogi.Move.null())
+            try:
+                val = -self._negamax(board, depth - 1 - NULL_MOVE_R, -beta, -beta + NULL_WINDOW, ply + 1)
+            finally:
                 board.pop()
-                if val > best: best = val
-                if val > alpha: alpha = val
-                if beta <= alpha: break
+            if val >= beta:
+                # beta is finite here, so the probe had a non-empty null window and its
+                # fail-high is a genuine lower bound; record it so transpositions prune
+                # without retrying the probe
+                self.transposition_table.store(key, depth, beta, TT_LOWER, tt_move)
+                return beta
+
+        legal = self._generate_ordered(board, ply, tt_move)
+        if not legal:
+            return self._eval_signed(board, checkmate=board.is_check(), legal=legal)
+
+        # Bind the per-child calls once; they run for every move at every node.
+        # Frontier children go straight to their leaf evaluation.
+        push, pop = board.push, board.pop
+        search = self._negamax if depth > 1 else self._frontier_leaf
+        child_depth, child_ply = depth - 1, ply + 1
+        best, best_move = _NINF, None
+        for mv in legal:
+            push(mv)
+            val = -search(board, child_depth, -beta, -alpha, child_ply)
+            pop()
+            if val > best: best, best_move = val, mv
+            if val > alpha: alpha = val
+            if alpha >= beta:
+                self._record_cutoff(board, mv, depth, ply)
+                break
+
+        if best <= alpha_orig:
+            flag = TT_UPPER
+        elif best >= beta:
+            flag = TT_LOWER
         else:
-            best = float('inf')
-            for mv in legal:
-                board.push(mv)
-                val = self._minimax(board, depth-1, alpha, beta, True)
-                board.pop()
-                if val < best: best = val
-                if val < beta: beta = val
-                if beta <= alpha: break
+            flag = TT_EXACT
+        self.transposition_table.store(key, depth, best, flag, best_move)
+        return best
+
+    def _frontier_leaf(self, board: shogi.Board, depth: int, alpha: float, beta: float, ply: int) -> float:
+        """
+        Score a child of a depth-1 node. Same result as _negamax at depth 0,
+        without repeating its node bookkeeping for every child of the frontier.
+        """
+        if board.is_fourfold_repetition():
+            return self._eval_signed(board)
+        return self._quiescence(board, alpha, beta, QUIESCENCE_DEPTH)
 
-        self.transposition_table[key] = best
+    def _quiescence(self, board: shogi.Board, alpha: float, beta: float, depth: int) -> float:
+        """Search captures only until the position is quiet, standing pat on the static eval."""
+        self.nodes_evaluated += 1
+        if not self.nodes_evaluated % TIME_CHECK_INTERVAL and (self._stopped or time.time() > self._deadline):
+            raise _TimeUp()
+        legal = list(board.legal_moves)
+        stand_pat = self._eval_signed(board, legal=legal)
+        if depth == 0 or stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        # Drops never capture, so an occupied destination means a capture
+        pieces = board.pieces
+        captures = [mv for mv in legal if pieces[mv.to_square]]
+        best = stand_pat
+        for mv in self._order_moves(board, captures):
+            board.push(mv)
+            val = -self._quiescence(board, -beta, -alpha, depth - 1)
+            board.pop()
+            if val > best: best = val
+            if val > alpha: alpha = val
+            if alpha >= beta:
+                break
         return best
 
-    def _evaluate_position(self, board: shogi.Board) -> float:
+    def _eval_signed(self, board: shogi.Board, checkmate: Optional[bool] = None,
+                     legal: Optional[List[shogi.Move]] = None) -> float:
+        """_evaluate_position from the side to move's point of view."""
+        score = self._evaluate_position(board, checkmate, legal)
+        return score if board.turn == shogi.BLACK else -score
+
+    def _evaluate_position(self, board: shogi.Board, checkmate: Optional[bool] = None,
+                           legal: Optional[List[shogi.Move]] = None) -> float:
+        """
+        Static evaluation from Black's point of view. Callers that already
+        have the legal moves, or know whether the side to move is mated,
+        pass them in to save another legal-move generation.
+        """
         score = 0.0
-        
-        # Material and positional
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece is None:
-                continue
-            base = self.piece_values.get(piece.piece_type, 0)
-            pos = self._get_positional_value(piece, sq)
-
-            # Fuzzy spatial contributions
-            r = sq // 9
-            c = sq % 9
-            if piece.color == shogi.BLACK:
-                f_center = self.fuzzy.center[r][c]
-                f_flank = self.fuzzy.flanks[r][c]
-                f_promo = self.fuzzy.promotion_black[r][c]
-                f_drop  = self.fuzzy.drop_potential_black[r][c]
-            else:
-                # mirror vertical for white side orientation
-                mr = 8 - r
-                f_center = self.fuzzy.center[mr][c]
-                f_flank = self.fuzzy.flanks[mr][c]
-                f_promo = self.fuzzy.promotion_white[mr][c]
-                f_drop  = self.fuzzy.drop_potential_white[mr][c]
-
-            # King safety uses same orientation (symmetric table)
-            f_king = self.fuzzy.king_safety[r][c]
-
-            w = self.fuzzy.weights
-            fuzzy_bonus = (w["w_center"]*f_center + w["w_flanks"]*f_flank +
-                           w["w_promo"]*f_promo + w["w_kings"]*f_king +
-                           w["w_drop"]*f_drop)
-
-            # Special handling for king - heavily penalize center positions
-            if piece.piece_type == shogi.KING:
-                # Strong penalty for king in center (files 3-5, ranks 3-5)
-                if 3 <= r <= 5 and 3 <= c <= 5:
-                    fuzzy_bonus -= 5.0  # Heavy penalty
-                # Moderate penalty for king in near-center (files 2-6, ranks 2-6)
-                elif 2 <= r <= 6 and 2 <= c <= 6:
-                    fuzzy_bonus -= 2.0
-                
-                # Override center bonus for king
-                # Use only king safety, ignore center control for king
-                fuzzy_bonus = w["w_kings"]*f_king - (1.0 - f_king) * 3.0
+        # Pawn structure, king exposure and mobility are whole tenths of a
+        # point; they are summed as ints and scaled once at the end
+        tenths = 0
 
-            val = base + pos + base * 0.1 * fuzzy_bonus  # Increased fuzzy influence
-            if piece.color == shogi.BLACK:
-                score += val
-            else:
-                score -= val
+        # Material, position, fuzzy bonus and center control come from one
+        # piece-square table; pawns and kings get their extra terms inline
+        # Walk only the occupied squares, lowest set bit first
+        pieces = board.pieces
+        white = board.occupied[shogi.WHITE]
+        occ = board.occupied.bits
+        pst = self._piece_square_table
+        king_squares = [None, None]
+        pawn_files = [0, 0]  # per color, bit c set once a pawn is seen in column c
+        while occ:
+            low = occ & -occ
+            occ ^= low
+            sq = low.bit_length() - 1
+            code = pieces[sq] | WHITE_CODE_BIT if white & low else pieces[sq]
+            score += pst[code][sq]
+
+            pt = code & ~WHITE_CODE_BIT
+            if pt == shogi.KING:
+                king_squares[code >> 4] = sq
+            # Pawns: bonus for advancement, penalty for each extra pawn on a file
+            elif pt == shogi.PAWN:
+                color = code >> 4
+                bit = 1 << _FILE[sq]
+                advancement_bonus = _PAWN_ADVANCE[color][sq]
+                if pawn_files[color] & bit:
+                    advancement_bonus -= 20  # Doubled pawn penalty
+                pawn_files[color] |= bit
+                tenths += advancement_bonus if color == shogi.BLACK else -advancement_bonus
+
+        # King exposure: each empty or enemy-held neighbour costs 2
+        for color, king_sq in enumerate(king_squares):
+            if king_sq is None:
+                continue
+            exposed = 0
+            for adj in KING_NEIGHBOURS[king_sq]:
+                if not pieces[adj] or (white >> adj & 1) != color:
+                    exposed += 1
+            tenths += -20 * exposed if color == shogi.BLACK else 20 * exposed
 
         # Pieces in hand: reduced value
-        for color in [shogi.BLACK, shogi.WHITE]:
-            hand = board.pieces_in_hand[color]
-            for ptype, cnt in hand.items():
-                pv = self.piece_values.get(ptype, 0) * 0.5 * cnt
-                score += pv if color == shogi.BLACK else -pv
-
-        # Additional strategic evaluations
-        score += self._evaluate_center_control(board)
-        score += self._evaluate_piece_activity(board)
-        score += self._evaluate_king_safety_extended(board)
-        score += self._evaluate_pawn_structure(board)
-        
+        hand_values = self._hand_value_tenths
+        black_hand, white_hand = board.pieces_in_hand
+        for ptype, cnt in black_hand.items():
+            tenths += hand_values[ptype] * cnt
+        for ptype, cnt in white_hand.items():
+            tenths -= hand_values[ptype] * cnt
+
+        # Mobility of the side to move: 0.1 per board move, 0.3 if it captures
+        if legal is None:
+            legal = list(board.legal_moves)
+        mobility = 0
+        for mv in legal:
+            if mv.from_square is not None:
+                mobility += 3 if pieces[mv.to_square] else 1
+        tenths += mobility if board.turn == shogi.BLACK else -mobility
+        score += tenths * 0.1
+
         # Checkmate check
-        if board.is_checkmate():
+        if checkmate is None:
+            checkmate = not legal and board.is_check()
+        if checkmate:
             score = 10000 if board.turn == shogi.WHITE else -10000
 
         return score
 
-    def _evaluate_piece_activity(self, board: shogi.Board) -> float:
-        """Evaluate how active/mobile pieces are"""
-        score = 0.0
-        for sq in range(81):
-            piece = board.piece_at(sq)
-            if piece is None:
-                continue
-            
-            # Count possible moves for this piece
-            possible_moves = 0
-            for move in board.legal_moves:
-                if move.from_square == sq:
-                    possible_moves += 1
-                    # Bonus for attacking enemy pieces
-                    target = board.piece_at(move.to_square)
-                    if target and target.color != piece.color:
-                        possible_moves += 2  # Extra bonus for attacks
-            
-            mobility_bonus = possible_moves * 0.1
-            if piece.color == shogi.BLACK:
-                score += mobility_bonus
-            else:
-                score -= mobility_bonus
-        
-        return score
+    def _build_piece_code_tables(self) -> Tuple[List[float], List[List[float]]]:
+        """Signed material and positional tables indexed by piece code."""
+        values = [0.0] * NUM_PIECE_CODES
+        # Piece types without a table share one all-zero row
+        zeros = [0.0] * 81
+        positional = [zeros] * NUM_PIECE_CODES
+        for pt in shogi.PIECE_TYPES:
+            table = self.positional_values.get(pt)
+            # Flatten to square order once; White reads the rank-mirrored square
+            flat = [v for row in table for v in row] if table is not None else None
+            for color in shogi.COLORS:
+                code = piece_code(pt, color)
+                sign = 1 if color == shogi.BLACK else -1
+                values[code] = sign * self._piece_value_arr[pt]
+                if flat is None:
+                    continue
+                if color == shogi.BLACK:
+                    positional[code] = [float(v) for v in flat]
+                else:
+                    positional[code] = [-float(flat[(8 - _RANK[sq]) * 9 + _FILE[sq]]) for sq in range(81)]
+        return values, positional
 
-    def _evaluate_king_safety_extended(self, board: shogi.Board) -> float:
-        """Enhanced king safety evaluation"""
-        score = 0.0
-        
-        for color in [shogi.BLACK, shogi.WHITE]:
-            king_sq = None
-            for sq in range(81):
-                piece = board.piece_at(sq)
-                if piece and piece.piece_type == shogi.KING and piece.color == color:
-                    king_sq = sq
-                    break
-            
-            if king_sq is None:
-                continue
-                
-            king_r = king_sq // 9
-            king_c = king_sq % 9
-            
-            # Penalty for exposed king
-            exposed_penalty = 0
-            # Check adjacent squares for protection
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    nr, nc = king_r + dr, king_c + dc
-                    if 0 <= nr < 9 and 0 <= nc < 9:
-                        adj_sq = nr * 9 + nc
-                        adj_piece = board.piece_at(adj_sq)
-                        if adj_piece is None or adj_piece.color != color:
-                            exposed_penalty += 1
-            
-            safety_score = -exposed_penalty * 2
-            if color == shogi.BLACK:
-                score += safety_score
-            else:
-                score -= safety_score
-        
-        return score
+    @staticmethod
+    def _board_to_array(board: shogi.Board) -> List[int]:
+        """Snapshot the board as 81 piece codes (0 = empty square)."""
+        white = board.occupied[shogi.WHITE]
+        return [pt | WHITE_CODE_BIT if white >> sq & 1 else pt
+                for sq, pt in enumerate(board.pieces)]
 
-    def _evaluate_pawn_structure(self, board: shogi.Board) -> float:
-        """Evaluate pawn structure and advancement"""
-        score = 0.0
-        
-        for color in [shogi.BLACK, shogi.WHITE]:
-            pawn_files = [False] * 9  # Track which files have pawns
-            
+    def _moving_piece_code(self, board: shogi.Board, move: shogi.Move) -> int:
+        pt = move.drop_piece_type if move.from_square is None else board.pieces[move.from_square]
+        return piece_code(pt, board.turn)
+
+    def _record_cutoff(self, board: shogi.Board, move: shogi.Move, depth: int, ply: int):
+        """Remember a quiet move that caused a beta cutoff."""
+        if board.pieces[move.to_square]:
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if move != killers[0]:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[self._moving_piece_code(board, move)][move.to_square] += depth * depth
+
+    def _age_move_ordering(self):
+        """Forget killers and halve history scores before a new search."""
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        for row in self.history:
             for sq in range(81):
-                piece = board.piece_at(sq)
-                if piece and piece.piece_type == shogi.PAWN and piece.color == color:
-                    file = sq % 9
-                    rank = sq // 9
-                    
-                    # Bonus for advanced pawns
-                    if color == shogi.BLACK:
-                        advancement = 8 - rank  # Black advances from rank 8 to 0
-                    else:
-                        advancement = rank  # White advances from rank 0 to 8
-                    
-                    advancement_bonus = advancement * 0.5
-                    
-                    # Check for doubled pawns (penalty)
-                    if pawn_files[file]:
-                        advancement_bonus -= 2  # Doubled pawn penalty
-                    pawn_files[file] = True
-                    
-                    if color == shogi.BLACK:
-                        score += advancement_bonus
-                    else:
-                        score -= advancement_bonus
-        
-        return score
+                row[sq] >>= 1
 
-    def _get_positional_value(self, piece: shogi.Piece, square: int) -> float:
-        pt = piece.piece_type
-        if pt not in self.positional_values:
-            return 0.0
-        f = square % 9
-        r = square // 9
-        if piece.color == shogi.WHITE:
-            r = 8 - r
-        return self.positional_values[pt][r][f]
+    def _generate_ordered(self, board: shogi.Board, ply: int,
+                          tt_move: Optional[shogi.Move] = None) -> List[shogi.Move]:
+        """
+        Generate the legal moves of a node exactly once, into the ply's reusable
+        buffer, and order them for search.
+        """
+        if ply < MAX_PLY:
+            moves = self._move_buffers[ply]
+            moves.clear()
+            moves.extend(board.legal_moves)
+        else:
+            moves = list(board.legal_moves)
+        if moves:
+            self._order_moves(board, moves, tt_move, ply)
+        return moves
 
-    def _evaluate_center_control(self, board: shogi.Board) -> float:
-        score = 0.0
-        center = [36,37,38,45,46,47,54,55,56]
-        for sq in center:
-            pc = board.piece_at(sq)
-            if pc is None: continue
-            score += 0.5 if pc.color == shogi.BLACK else -0.5
-        return score
+    def _order_moves(self, board: shogi.Board, moves: List[shogi.Move],
+                     tt_move: Optional[shogi.Move] = None, ply: Optional[int] = None) -> List[shogi.Move]:
+        killers = self.killers[ply] if ply is not None and ply < MAX_PLY else (None, None)
+        # Read the raw piece-type array instead of building Piece objects per move
+        pieces = board.pieces
+        values = self._piece_value_arr
+        history = self.history
+        color_bits = board.turn << 4
+        drop_bonus = _DROP_SQUARE_BONUS[board.turn]
+        defended = {}  # to_square -> attacked by the opponent, filled on demand
+
+        def is_defended(sq):
+            if sq not in defended:
+                defended[sq] = board.is_attacked_by(board.turn ^ 1, sq)
+            return defended[sq]
 
-    def _order_moves(self, board: shogi.Board, moves: List[shogi.Move]) -> List[shogi.Move]:
         def priority(mv):
             p = 0
+            moving = pieces[mv.from_square] if mv.from_square is not None else mv.drop_piece_type
             
             # King center penalty
-            king_penalty = self._penalize_king_center_moves(board, mv)
-            p += king_penalty
+            if moving == shogi.KING:
+                p += self._penalize_king_center_moves(board, mv)
             
-            # Heavy bonus for captures
-            captured_piece = board.piece_at(mv.to_square)
-            if captured_piece is not None:
-                p += 2000 + self.piece_values.get(captured_piece.piece_type, 0) * 10
+            # Heavy bonus for captures, ordered MVV-LVA (most valuable victim,
+            # then least valuable attacker)
+            victim = pieces[mv.to_square]
+            if victim:
+                # Static exchange shortcut: a capture that gives up more than it
+                # takes onto a defended square sinks below the killer moves
+                if values[moving] > values[victim] and is_defended(mv.to_square):
+                    p += 500 + (values[victim] - values[moving]) * 16
+                else:
+                    p += 2000 + values[victim] * 16 - values[moving]
+            else:
+                # Quiet moves: killers first, then by history of past cutoffs
+                if mv == killers[0] or mv == killers[1]:
+                    p += 900
+                p += history[moving | color_bits][mv.to_square]
             
             # Promotion bonus
             if mv.promotion:
@@ -836,46 +1105,37 @@ class ShogiAI:
             
             # Drop piece evaluation
             if mv.drop_piece_type is not None:
-                p += self.piece_values.get(mv.drop_piece_type, 0) * 15
-                f = mv.to_square % 9
-                r = mv.to_square // 9
-                # Bonus for drops in enemy territory or center
-                if 2 <= f <= 6 and 2 <= r <= 6:
-                    p += 100
-                # Extra bonus for aggressive drops (closer to enemy)
-                if board.turn == shogi.BLACK and r <= 3:
-                    p += 150
-                elif board.turn == shogi.WHITE and r >= 5:
-                    p += 150
+                # Bonus for drops in the center and aggressive drops near the enemy
+                p += values[mv.drop_piece_type] * 15 + drop_bonus[mv.to_square]
             
             # Bonus for moving pieces forward
             if mv.from_square is not None:
-                from_r = mv.from_square // 9
-                to_r = mv.to_square // 9
+                from_r = _RANK[mv.from_square]
+                to_r = _RANK[mv.to_square]
                 if board.turn == shogi.BLACK and to_r < from_r:  # Moving forward for black
                     p += 50 + (from_r - to_r) * 10
                 elif board.turn == shogi.WHITE and to_r > from_r:  # Moving forward for white
                     p += 50 + (to_r - from_r) * 10
             
             # Bonus for center moves (but not for king)
-            to_f = mv.to_square % 9
-            to_r = mv.to_square // 9
-            moving_piece = board.piece_at(mv.from_square) if mv.from_square else None
-            if (3 <= to_f <= 5 and 3 <= to_r <= 5 and 
-                (not moving_piece or moving_piece.piece_type != shogi.KING)):
-                p += 30
-            
-            # Bonus for check moves
-            board.push(mv)
-            if board.is_check():
-                p += 300
-            board.pop()
-            
-            # Small random factor to break ties
-            p += random.randint(0, 20)
+            if moving != shogi.KING:
+                p += _CENTER_MOVE_BONUS[mv.to_square]
             return p
         
-        return sorted(moves, key=priority, reverse=True)
+        # Ordered in place so per-ply move buffers are reused. Cutoffs usually
+        # come from the first few moves, so long lists only get their head
+        # sorted and keep generator order after it.
+        if len(moves) > 2 * PARTIAL_SORT_K:
+            head = heapq.nlargest(PARTIAL_SORT_K, moves, key=priority)
+            in_head = set(head)
+            moves[:] = head + [mv for mv in moves if mv not in in_head]
+        else:
+            moves.sort(key=priority, reverse=True)
+        # Best move remembered by the transposition table is searched first
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
 
     def set_difficulty(self, difficulty: str):
         settings = {
@@ -890,8 +1150,23 @@ class ShogiAI:
         else:
             self.depth, self.time_limit = 3, 3.0
 
+    def stop(self):
+        """
+        Make a get_best_move running on another thread return within a few
+        nodes, as if its time ran out. Searches keep stopping early until
+        resume() is called.
+        """
+        self._stopped = True
+
+    def resume(self):
+        """Let searches run normally again after stop()."""
+        self._stopped = False
+
     def reset_memory(self):
         """Reset AI memory for new game"""
         self.position_history.clear()
+        self._position_ring.clear()
         self.transposition_table.clear()
         self.move_count = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 81 for _ in range(NUM_PIECE_CODES)]
@@ -10,8 +10,33 @@ import tkinter as tk
 from tkinter import ttk, messagebox, font
 import shogi
 from shogi_ai import ShogiAI, default_fuzzy_profiles, FuzzyProfile
-import threading
 import time
+from functools import partial
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+BOARD_CELL = 60  # board square size in pixels
+ANALYSIS_CACHE_SIZE = 4096  # positions whose check/mate/stalemate flags are remembered
+UNDO_CACHE_DEPTH = 512  # played moves whose previous legal-move cache is kept for undo
+AI_POLL_MS = 50  # how often the Tk loop checks for a finished AI search
+# Board geometry lookups, built once at import instead of recomputed per cell
+_SQUARE_OF = tuple(tuple(r*9 + c for c in range(9)) for r in range(9))  # [row][col] -> square
+_COORDS_OF = tuple((sq//9, sq%9) for sq in range(81))  # square -> (row, col)
+_NOTATION_OF = tuple(f"{9 - sq%9}{chr(ord('a') + sq//9)}" for sq in range(81))  # square -> '7g'
+# Turn banner for every (game mode, side to move, human's side); status panel turn line by side
+_SIDE_NAMES = ('Black (先手)', 'White (後手)')
+def _turn_banner(mode, turn, user_color):
+    if mode == "human_vs_ai":
+        return f"Your turn ({_SIDE_NAMES[user_color]})" if turn == user_color else f"AI turn ({_SIDE_NAMES[turn]})"
+    if mode == "ai_vs_ai":
+        return f"AI vs AI — {('Black', 'White')[turn]} to move"
+    return f"Turn: {_SIDE_NAMES[turn]}"
+_TURN_TEXT = {(mode, turn, user): _turn_banner(mode, turn, user)
+              for mode in ("human_vs_ai", "human_vs_human", "ai_vs_ai")
+              for turn in (shogi.BLACK, shogi.WHITE) for user in (shogi.BLACK, shogi.WHITE)}
+_STATUS_TURN = tuple(f"Turn: {name}" for name in _SIDE_NAMES)
+HAND_PIECE_TYPES = (shogi.PAWN, shogi.LANCE, shogi.KNIGHT, shogi.SILVER, shogi.GOLD, shogi.BISHOP, shogi.ROOK)
+HAND_SELECTED_BG = '#FFD700'  # background of the hand piece picked for a drop
 
 class EnhancedShogiGUI:
     def __init__(self, root):
@@ -27,9 +52,39 @@ class EnhancedShogiGUI:
         self.selected_hand_piece = None
         self.selected_hand_color = None
         self.move_history = []
-        self.highlighted_moves = []
+        self._recent_moves = deque(maxlen=8)  # USI of the last moves, for the status panel
+        self.highlighted_moves = frozenset()
         self.use_japanese = True
 
+        # Legal moves of the displayed position, regenerated only when it changes
+        self._legal_cache_key = None
+        self._legal_moves = []
+        self._legal_set = set()
+        self._legal_targets = {}  # (from_square, drop_piece_type) -> frozenset of destination squares
+        self._analysis_cache = OrderedDict()  # Zobrist hash -> check/checkmate/stalemate flags, LRU
+        self._legal_listing = (None, "")  # (Zobrist hash, Show Legal Moves text)
+        # Legal-move caches of the positions moves were played from, restored on undo
+        self._legal_stack = deque(maxlen=UNDO_CACHE_DEPTH)
+
+        # Last (text, fg, bg, outline width) drawn on each square, so redraws only touch changed squares
+        self._last_render = {}
+        # What the rank labels and hand panels were last drawn from, to skip unchanged redraws
+        self._rank_labels_japanese = None
+        self._hand_render_key = None
+        self._redraw_pending = False  # a board redraw is already queued for the next idle tick
+
+        # Status panel refreshes are coalesced into one per idle tick, and
+        # skipped while the game state they were built from is unchanged
+        self._status_pending = False
+        self._last_status_key = None
+        self._status_has_header = False  # the panel already shows a status block
+        self._pending_log = []  # log lines waiting for the next idle tick
+
+        # KIF viewer, created on first use and hidden rather than destroyed
+        self._kif_win = None
+        self._kif_text = None
+        self._kif_last_sfen = None
+
         # Modes and AIs
         self.game_mode = "human_vs_ai"  # "human_vs_ai", "human_vs_human", "ai_vs_ai"
         profile_a, profile_b = default_fuzzy_profiles()
@@ -43,7 +98,17 @@ class EnhancedShogiGUI:
         self.ai_vs_ai_running = False
         self.ai_delay_ms = 300  # move cadence
 
+        # One long-lived search thread; it only ever sees copies of the board
+        self._ai_executor = ThreadPoolExecutor(max_workers=1)
+        self._ai_request = 0  # id of the latest search; results of older ones are dropped
+        self._ai_search = None  # (future, ai) of the search on the worker, if any
+
         self._init_symbols_and_colors()
+        self._init_fonts()
+        self._apply_language()
+        # Checker colours depend on the palette, so they are built per instance
+        self._checker_bg = tuple(tuple(self.colors['board_light'] if (r+c)%2==0 else self.colors['board_dark']
+                                       for c in range(9)) for r in range(9))
         self.setup_ui()
         self.update_display()
 
@@ -80,13 +145,13 @@ class EnhancedShogiGUI:
         info_frame.pack(fill=tk.X, pady=(0,10))
 
         self.turn_label = ttk.Label(info_frame, text="Turn: Black (先手)",
-                                    font=('Arial',14,'bold'), foreground='#2e7d32')
+                                    font=self._font_turn, foreground='#2e7d32')
         self.turn_label.pack(side=tk.LEFT)
 
-        self.ai_thinking_label = ttk.Label(info_frame, text="", font=('Arial',12,'italic'), foreground='#ff9800')
+        self.ai_thinking_label = ttk.Label(info_frame, text="", font=self._font_thinking, foreground='#ff9800')
         self.ai_thinking_label.pack(side=tk.LEFT, padx=(20,0))
 
-        self.move_label = ttk.Label(info_frame, text="Move: 1", font=('Arial',12), foreground='#1976d2')
+        self.move_label = ttk.Label(info_frame, text="Move: 1", font=self._font_info, foreground='#1976d2')
         self.move_label.pack(side=tk.LEFT, padx=(20,0))
 
         board_container = ttk.Frame(left_panel, relief=tk.RAISED, borderwidth=2)
@@ -95,21 +160,38 @@ class EnhancedShogiGUI:
         # File labels
         for col in range(9):
             file_num = 9 - col
-            ttk.Label(board_container, text=str(file_num), font=('Arial',10,'bold')).grid(row=0, column=col+1, pady=(0,2))
+            ttk.Label(board_container, text=str(file_num), font=self._font_label).grid(row=0, column=col+1, pady=(0,2))
 
-        self.square_buttons = []
         self.rank_labels = []
         for row in range(9):
-            rank_label = ttk.Label(board_container, text="", font=('Arial',10,'bold'))
+            rank_label = ttk.Label(board_container, text="", font=self._font_label)
             rank_label.grid(row=row+1, column=0, padx=(0,2))
             self.rank_labels.append(rank_label)
-            row_btns = []
+        # Keep the label rows and columns one square wide so they line up with the canvas
+        for i in range(1, 10):
+            board_container.rowconfigure(i, minsize=BOARD_CELL)
+            board_container.columnconfigure(i, minsize=BOARD_CELL)
+
+        # The board is one canvas with a rectangle and a text item per square
+        self.canvas = tk.Canvas(board_container, width=9*BOARD_CELL, height=9*BOARD_CELL,
+                                highlightthickness=0, bg=self.colors['board_dark'])
+        self.canvas.grid(row=1, column=1, rowspan=9, columnspan=9)
+        self._rect_ids = []
+        self._text_ids = []
+        for row in range(9):
+            rect_row, text_row = [], []
             for col in range(9):
-                btn = tk.Button(board_container, width=4, height=2, font=('Arial',16,'bold'),
-                                relief=tk.RAISED, borderwidth=1, command=lambda r=row,c=col: self.on_square_click(r,c))
-                btn.grid(row=row+1, column=col+1, padx=0, pady=0)
-                row_btns.append(btn)
-            self.square_buttons.append(row_btns)
+                x, y = col*BOARD_CELL, row*BOARD_CELL
+                rect_row.append(self.canvas.create_rectangle(x, y, x+BOARD_CELL, y+BOARD_CELL,
+                                                             fill=self._checker_bg[row][col], outline='black'))
+                text_row.append(self.canvas.create_text(x+BOARD_CELL/2, y+BOARD_CELL/2, text='',
+                                                        font=self._font_board))
+            self._rect_ids.append(rect_row)
+            self._text_ids.append(text_row)
+        self.canvas.bind('<Button-1>', self.on_canvas_click)
+        # Flat (square, checker colour, text item, rectangle item) per cell for redraws
+        self._cells = tuple((_SQUARE_OF[r][c], self._checker_bg[r][c], self._text_ids[r][c], self._rect_ids[r][c])
+                            for r in range(9) for c in range(9))
 
         # Right panel - increased width for two columns
         right_panel = ttk.Frame(main_container, width=720)
@@ -162,10 +244,7 @@ class EnhancedShogiGUI:
         ttk.Button(controls_frame, text="↶ Undo Move", command=self.undo_move).pack(fill=tk.X, pady=2)
         ttk.Button(controls_frame, text="📋 Show Legal Moves", command=self.show_legal_moves).pack(fill=tk.X, pady=2)
         ttk.Button(controls_frame, text="📄 Show KIF Board", command=self.show_kif_board).pack(fill=tk.X, pady=2)
-<<<<<<< Updated upstream
         ttk.Button(controls_frame, text="🌐 Toggle Language", command=self.toggle_language).pack(fill=tk.X, pady=2)
-=======
-        ttk.Button(controls_frame, text="� Toggle Language", command=self.toggle_language).pack(fill=tk.X, pady=2)
 
         # Manual input
         input_frame = ttk.LabelFrame(left_column, text="Manual Move Input", padding=10)
@@ -173,7 +252,7 @@ class EnhancedShogiGUI:
         ttk.Label(input_frame, text="USI Format (e.g., 7g7f):").pack(anchor=tk.W)
         entry_frame = ttk.Frame(input_frame)
         entry_frame.pack(fill=tk.X, pady=(5,0))
-        self.move_entry = ttk.Entry(entry_frame, width=12, font=('Courier',10))
+        self.move_entry = ttk.Entry(entry_frame, width=12, font=self._font_mono)
         self.move_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0,5))
         self.move_entry.bind('<Return>', self.on_move_enter)
         ttk.Button(entry_frame, text="Play", command=self.play_manual_move).pack(side=tk.RIGHT)
@@ -187,11 +266,11 @@ class EnhancedShogiGUI:
         black_castle_frame.pack(fill=tk.X, pady=(0,5))
         
         self.black_mino_label = ttk.Label(black_castle_frame, text="Mino Castle: 0.0% complete", 
-                                         font=('Arial', 9))
+                                         font=self._font_small)
         self.black_mino_label.pack(anchor=tk.W)
         
         self.black_yagura_label = ttk.Label(black_castle_frame, text="Yagura Castle: 0.0% complete", 
-                                           font=('Arial', 9))
+                                           font=self._font_small)
         self.black_yagura_label.pack(anchor=tk.W)
         
         # White castles subsection
@@ -199,36 +278,54 @@ class EnhancedShogiGUI:
         white_castle_frame.pack(fill=tk.X, pady=(5,0))
         
         self.white_mino_label = ttk.Label(white_castle_frame, text="Mino Castle: 0.0% complete", 
-                                         font=('Arial', 9))
+                                         font=self._font_small)
         self.white_mino_label.pack(anchor=tk.W)
         
         self.white_yagura_label = ttk.Label(white_castle_frame, text="Yagura Castle: 0.0% complete", 
-                                           font=('Arial', 9))
+                                           font=self._font_small)
         self.white_yagura_label.pack(anchor=tk.W)
->>>>>>> Stashed changes
 
         # Pieces in hand
         pieces_frame = ttk.LabelFrame(right_column, text="Pieces in Hand (持駒)", padding=10)
         pieces_frame.pack(fill=tk.X, pady=(0,10))
         
         # Black player's pieces frame (darker theme)
-        black_label = tk.Label(pieces_frame, text="Black Player (先手)", font=('Arial', 10, 'bold'), 
+        black_label = tk.Label(pieces_frame, text="Black Player (先手)", font=self._font_label, 
                               bg='#f0f0f0', fg='#000000')
         black_label.pack(fill=tk.X, pady=(0,2))
         self.black_pieces_frame = tk.Frame(pieces_frame, bg='#1a1a1a', relief=tk.SUNKEN, bd=3, padx=5, pady=5)
         self.black_pieces_frame.pack(fill=tk.X, pady=2)
         
         # White player's pieces frame (lighter theme)
-        white_label = tk.Label(pieces_frame, text="White Player (後手)", font=('Arial', 10, 'bold'), 
+        white_label = tk.Label(pieces_frame, text="White Player (後手)", font=self._font_label, 
                               bg='#f0f0f0', fg='#000000')
         white_label.pack(fill=tk.X, pady=(5,2))
         self.white_pieces_frame = tk.Frame(pieces_frame, bg='#e8e8e8', relief=tk.SUNKEN, bd=3, padx=5, pady=5)
         self.white_pieces_frame.pack(fill=tk.X, pady=2)
 
+        # Every hand slot gets its button once; redraws only relabel, show or hide them
+        self.hand_buttons = {}
+        self._hand_empty_labels = {}
+        self._hand_button_bg = {}
+        self._hand_button_state = {}  # button -> (bg, relief) it was last configured with
+        for color, frame, bg, fg, active_bg, empty_fg in (
+                (shogi.BLACK, self.black_pieces_frame, '#2C2C2C', '#FFFFFF', '#404040', '#CCCCCC'),  # dark for black
+                (shogi.WHITE, self.white_pieces_frame, '#F0F0F0', '#000000', '#E0E0E0', '#666666')):  # light for white
+            self._hand_button_bg[color] = bg
+            for pt in HAND_PIECE_TYPES:
+                # command (not a <Button-1> binding) keeps release-to-click and keyboard activation
+                btn = tk.Button(frame, font=self._font_hand, width=6, height=1,
+                                bg=bg, fg=fg, relief=tk.RAISED, bd=2, activebackground=active_bg,
+                                command=partial(self.select_piece_from_hand, pt, color))
+                self.hand_buttons[(color, pt)] = btn
+                self._hand_button_state[btn] = (bg, tk.RAISED)
+            self._hand_empty_labels[color] = tk.Label(frame, text="None", font=self._font_small,
+                                                      fg=empty_fg, bg=frame.cget('bg'))
+
         # Status (spans both columns at bottom)
         status_frame = ttk.LabelFrame(right_panel, text="Game Status", padding=10)
         status_frame.pack(fill=tk.BOTH, expand=True, pady=(10,0))
-        self.status_text = tk.Text(status_frame, width=90, height=10, font=('Courier',9),
+        self.status_text = tk.Text(status_frame, width=90, height=10, font=self._font_status,
                                    wrap=tk.WORD, bg='#f8f8f8')
         self.status_text.pack(fill=tk.BOTH, expand=True)
         scrollbar = ttk.Scrollbar(status_frame, orient=tk.VERTICAL, command=self.status_text.yview)
@@ -239,63 +336,172 @@ class EnhancedShogiGUI:
         instructions.pack(fill=tk.X, pady=(5,0))
         instruction_text = """Click pieces → destination. Drops: hand piece → square.
 Manual: USI like '7g7f'. AI vs AI shows different strategies."""
-        ttk.Label(instructions, text=instruction_text, font=('Arial',8), justify=tk.LEFT).pack()
+        ttk.Label(instructions, text=instruction_text, font=self._font_hint, justify=tk.LEFT).pack()
+
+    def _init_fonts(self):
+        # One Font object per style, shared by every widget that uses it
+        self._font_turn = font.Font(family='Arial', size=14, weight='bold')
+        self._font_thinking = font.Font(family='Arial', size=12, slant='italic')
+        self._font_info = font.Font(family='Arial', size=12)
+        self._font_label = font.Font(family='Arial', size=10, weight='bold')
+        self._font_board = font.Font(family='Arial', size=16, weight='bold')
+        self._font_small = font.Font(family='Arial', size=9)
+        self._font_hint = font.Font(family='Arial', size=8)
+        self._font_mono = font.Font(family='Courier', size=10)
+        self._font_hand = font.Font(family='Courier', size=10, weight='bold')
+        self._font_status = font.Font(family='Courier', size=9)
+
+    def _apply_language(self):
+        """Select the symbol and rank-label tables for the current language and rebuild what uses them."""
+        self._active_symbols = self.japanese_piece_symbols if self.use_japanese else self.english_piece_symbols
+        self._active_rank_labels = self.japanese_rank_labels if self.use_japanese else self.english_rank_labels
+        self._initial_cells = None  # start-position snapshot, rebuilt with the new symbols
+        # (piece_type, color) -> (symbol, text colour)
+        self._piece_render = {}
+        for pt in shogi.PIECE_TYPES:
+            symbol = self.get_piece_symbol(pt)
+            self._piece_render[(pt, shogi.BLACK)] = (symbol, self.colors['black_piece'])
+            self._piece_render[(pt, shogi.WHITE)] = (symbol if self.use_japanese else symbol.lower(),
+                                                     self.colors['white_piece'])
 
     # --- Display helpers and board conversions (same as previous version) ---
     def get_piece_symbol(self, piece_type):
-        if self.use_japanese:
-            return self.japanese_piece_symbols.get(piece_type, '?')
-        else:
-            return self.english_piece_symbols.get(piece_type, '?')
+        return self._active_symbols.get(piece_type, '?')
     def get_rank_labels(self):
-        return self.japanese_rank_labels if self.use_japanese else self.english_rank_labels
+        return self._active_rank_labels
     def update_display(self):
-        if self.game_mode == "human_vs_ai":
-            if self.board.turn == self.user_color:
-                turn_text = f"Your turn ({'Black (先手)' if self.user_color == shogi.BLACK else 'White (後手)'})"
-            else:
-                turn_text = f"AI turn ({'Black (先手)' if self.board.turn == shogi.BLACK else 'White (後手)'})"
-        elif self.game_mode == "ai_vs_ai":
-            turn_text = f"AI vs AI — {'Black' if self.board.turn==shogi.BLACK else 'White'} to move"
-        else:
-            turn_text = "Turn: Black (先手)" if self.board.turn == shogi.BLACK else "Turn: White (後手)"
-        self.turn_label.config(text=turn_text)
+        self.turn_label.config(text=_TURN_TEXT[(self.game_mode, self.board.turn, self.user_color)])
         self.move_label.config(text=f"Move: {self.board.move_number}")
-        labels = self.get_rank_labels()
-        for row in range(9):
-            self.rank_labels[row].config(text=labels[row])
-        for row in range(9):
-            for col in range(9):
-                square = self.get_square_from_coords(row, col)
-                piece = self.board.piece_at(square)
-                btn = self.square_buttons[row][col]
-                bg = self.colors['board_light'] if (row+col)%2==0 else self.colors['board_dark']
-                if piece is None:
-                    btn.config(text="", bg=bg, fg='black')
-                else:
-                    symbol = self.get_piece_symbol(piece.piece_type)
-                    if not self.use_japanese and piece.color == shogi.WHITE:
-                        symbol = symbol.lower()
-                    fg = self.colors['black_piece'] if piece.color==shogi.BLACK else self.colors['white_piece']
-                    btn.config(text=symbol, bg=bg, fg=fg)
-                if self.selected_square == square:
-                    btn.config(relief=tk.SUNKEN, bd=3, bg=self.colors['selected'])
-                elif square in self.highlighted_moves:
-                    btn.config(relief=tk.RAISED, bd=2, bg=self.colors['highlight'])
-                else:
-                    btn.config(relief=tk.RAISED, bd=1)
+        if self._rank_labels_japanese != self.use_japanese:
+            labels = self.get_rank_labels()
+            for row in range(9):
+                self.rank_labels[row].config(text=labels[row])
+            self._rank_labels_japanese = self.use_japanese
+        if not self.board.move_stack and self.selected_square is None and not self.highlighted_moves:
+            # The untouched start position always looks the same; classify it once per language
+            if self._initial_cells is None:
+                self._initial_cells = self._classify_cells()
+            cells = self._initial_cells
+        else:
+            cells = self._classify_cells()
+        last_render, itemconfig = self._last_render, self.canvas.itemconfig
+        for (square, _, text_id, rect_id), wanted in zip(self._cells, cells):
+            # Each itemconfig() is a Tcl round-trip: only redraw items that changed
+            text, fg, bg, bd = wanted
+            last = last_render.get(square)
+            if last == wanted:
+                continue
+            if last is None or last[:2] != wanted[:2]:
+                itemconfig(text_id, text=text, fill=fg)
+            if last is None or last[2:] != wanted[2:]:
+                itemconfig(rect_id, fill=bg, width=bd)
+            last_render[square] = wanted
         self.update_status()
         self.update_pieces_in_hand()
+        self.update_hand_button_states()
         self.update_castle_status()
 
+    def _request_redraw(self):
+        """Queue update_display for the next idle tick; repeated requests before then share one redraw."""
+        if self._redraw_pending:
+            return
+        self._redraw_pending = True
+        self.root.after_idle(self._do_redraw)
+
+    def _do_redraw(self):
+        self._redraw_pending = False
+        self.update_display()
+
+    def _classify_cells(self):
+        """(text, fg, bg, outline width) for every cell of self._cells, in order."""
+        # Bind everything the cell loop reads once per redraw. The board is read
+        # from its flat piece-type array and White's bitboard rather than
+        # building a Piece object per square through piece_at.
+        pieces, white, piece_render = self.board.pieces, self.board.occupied[shogi.WHITE], self._piece_render
+        selected_square, highlighted = self.selected_square, self.highlighted_moves
+        selected_bg, highlight_bg = self.colors['selected'], self.colors['highlight']
+        cells = []
+        for square, bg, _, _ in self._cells:
+            piece_type = pieces[square]
+            if not piece_type:
+                text, fg = "", 'black'
+            else:
+                text, fg = piece_render[(piece_type, white >> square & 1)]
+            if selected_square == square:
+                bd, bg = 3, selected_bg
+            elif square in highlighted:
+                bd, bg = 2, highlight_bg
+            else:
+                bd = 1
+            cells.append((text, fg, bg, bd))
+        return tuple(cells)
+
     def get_square_from_coords(self, row, col):
-        file = col; rank = row; return rank*9 + file
+        return _SQUARE_OF[row][col]
     def get_coords_from_square(self, square):
-        f = square%9; r = square//9; return (r,f)
+        return _COORDS_OF[square]
     def square_to_notation(self, square):
-        f = square%9; r = square//9; return f"{9-f}{chr(ord('a')+r)}"
+        return _NOTATION_OF[square]
+
+    def _legal(self):
+        """Legal moves of the current position as (list, set), cached by Zobrist hash."""
+        key = self.board.zobrist_hash()
+        if key != self._legal_cache_key:
+            self._legal_moves = list(self.board.legal_moves)
+            self._legal_set = set(self._legal_moves)
+            targets = {}
+            for mv in self._legal_moves:
+                targets.setdefault((mv.from_square, mv.drop_piece_type), set()).add(mv.to_square)
+            self._legal_targets = {origin: frozenset(squares) for origin, squares in targets.items()}
+            self._legal_cache_key = key
+        return self._legal_moves, self._legal_set
+
+    def _push_move(self, move):
+        """Play and record a move, keeping the legal-move cache of the position it leaves."""
+        if self._legal_cache_key == self.board.zobrist_hash():
+            self._legal_stack.append((len(self.board.move_stack), self._legal_cache_key,
+                                      self._legal_moves, self._legal_set, self._legal_targets))
+        self.board.push(move); self.move_history.append(move); self.log_move(move)
+
+    def _restore_legal_cache(self):
+        """After a pop, bring back the cache saved when the undone move was played."""
+        stack, ply = self._legal_stack, len(self.board.move_stack)
+        while stack and stack[-1][0] > ply:
+            stack.pop()
+        if stack and stack[-1][0] == ply and stack[-1][1] == self.board.zobrist_hash():
+            _, self._legal_cache_key, self._legal_moves, self._legal_set, self._legal_targets = stack.pop()
+
+    def _targets(self, from_square, drop_piece_type=None):
+        """Destination squares of the legal moves from a square, or of drops of a hand piece."""
+        self._legal()
+        return self._legal_targets.get((from_square, drop_piece_type), frozenset())
+
+    def _analysis(self):
+        """Check, checkmate and stalemate of the current position, memoised by Zobrist hash."""
+        key = self.board.zobrist_hash()
+        cache = self._analysis_cache
+        result = cache.get(key)
+        if result is None:
+            legal, _ = self._legal()
+            check = self.board.is_check()
+            result = {'check': check, 'checkmate': check and not legal, 'stalemate': not check and not legal}
+            cache[key] = result
+            if len(cache) > ANALYSIS_CACHE_SIZE: cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return result
+
+    def _is_game_over(self):
+        analysis = self._analysis()
+        # Repetition depends on the game's history, so it is checked rather than memoised
+        return analysis['checkmate'] or analysis['stalemate'] or self.board.is_fourfold_repetition()
 
     # --- User interactions ---
+    def on_canvas_click(self, event):
+        row, col = event.y // BOARD_CELL, event.x // BOARD_CELL
+        if 0 <= row < 9 and 0 <= col < 9:
+            self.on_square_click(row, col)
+
     def on_square_click(self, row, col):
         if self.ai_thinking or self.game_mode == "ai_vs_ai":
             return
@@ -305,7 +511,7 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
         piece = self.board.piece_at(square)
         if self.selected_hand_piece is not None:
             if self.try_drop_move(square): return
-            self.clear_selection(); self.update_display(); return
+            self.clear_selection(); self._request_redraw(); return
         if self.selected_square is None:
             if piece is not None and piece.color == self.board.turn:
                 self.selected_square = square
@@ -313,41 +519,44 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
                 self.selected_hand_piece = None
                 self.selected_hand_color = None
                 self.highlight_legal_moves()
-                self.update_display()
+                self._request_redraw()
         else:
             if square == self.selected_square:
                 self.clear_selection()
             else:
                 self.try_make_move(self.selected_square, square)
-            self.update_display()
+            self._request_redraw()
 
     def highlight_legal_moves(self):
         if self.selected_square is None: return
-        self.highlighted_moves = [mv.to_square for mv in self.board.legal_moves if mv.from_square == self.selected_square]
+        self.highlighted_moves = self._targets(self.selected_square)
 
     def clear_selection(self):
         self.selected_square = None; self.selected_piece = None
         self.selected_hand_piece = None; self.selected_hand_color = None
-        self.highlighted_moves = []
+        self.highlighted_moves = frozenset()
 
     def try_make_move(self, from_square, to_square):
         if self.selected_piece is None: return
-        move = shogi.Move(from_square, to_square)
-        if move in self.board.legal_moves:
-            self._push_and_continue(move)
+        _, legal_set = self._legal()
+        plain = shogi.Move(from_square, to_square)
+        promoted = shogi.Move(from_square, to_square, promotion=True)
+        # One set probe per variant; only ask when promotion is genuinely optional
+        can_stay, can_promote = plain in legal_set, promoted in legal_set
+        if can_stay and can_promote:
+            promote = messagebox.askyesno("Promote?", f"Promote the piece on {self.square_to_notation(to_square)}?")
+            self._push_and_continue(promoted if promote else plain)
+        elif can_stay or can_promote:
+            self._push_and_continue(plain if can_stay else promoted)
         else:
-            move = shogi.Move(from_square, to_square, promotion=True)
-            if move in self.board.legal_moves:
-                self._push_and_continue(move)
-            else:
-                messagebox.showwarning("Invalid Move", f"Invalid move: {move.usi()}"); self.clear_selection()
+            messagebox.showwarning("Invalid Move", f"Invalid move: {plain.usi()}"); self.clear_selection()
 
     def _push_and_continue(self, move):
-        self.board.push(move); self.move_history.append(move); self.log_move(move)
-        self.clear_selection(); self.update_display()
+        self._push_move(move)
+        self.clear_selection(); self._request_redraw()
         
         # Check for checkmate after human move
-        if self.board.is_checkmate():
+        if self._analysis()['checkmate']:
             self.show_checkmate_dialog()
             return
             
@@ -361,7 +570,7 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
         if not txt: return
         try:
             move = shogi.Move.from_usi(txt)
-            if move in self.board.legal_moves:
+            if move in self._legal()[1]:
                 self._push_and_continue(move)
                 self.move_entry.delete(0, tk.END)
             else:
@@ -375,17 +584,20 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
     def new_game(self):
         self.board = shogi.Board()
         self.move_history = []
+        self._recent_moves.clear()
+        self._legal_stack.clear()
         self.clear_selection()
-        self.ai_thinking = False
-        self.ai_thinking_label.config(text="")
-        self.status_text.delete(1.0, tk.END)
+        self._cancel_ai_search()
+        self._stop_ai_search()
+        self._clear_status_panel()
         
         # Reset AI memories to prevent repetition issues
+        # Search tables persist between moves and are only cleared here,
+        # once no search is left running on them
         self.ai_black.reset_memory()
         self.ai_white.reset_memory()
-        self.ai.reset_memory()
         
-        self.update_display()
+        self._request_redraw()
         if self.game_mode == "human_vs_ai" and self.board.turn != self.user_color:
             self.make_ai_move()
         elif self.game_mode == "ai_vs_ai":
@@ -394,41 +606,71 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
     def undo_move(self):
         if self.board.move_number > 1:
             mv = self.board.pop()
+            self._restore_legal_cache()
+            searching = self._ai_search is not None
+            self._cancel_ai_search(); self._stop_ai_search()
             if self.move_history: self.move_history.pop()
+            self._recent_moves.clear(); self._recent_moves.extend(mv.usi() for mv in self.move_history[-8:])
             self.log_message(f"↶ Undid move: {mv.usi()}")
-            self.clear_selection(); self.update_display()
+            self.clear_selection(); self._request_redraw()
+            # The cancelled search was the AI vs AI loop's next step; carry on from here
+            if searching and self.ai_vs_ai_running and self.game_mode == "ai_vs_ai":
+                self.root.after(self.ai_delay_ms, self._ai_vs_ai_tick)
         else:
             messagebox.showinfo("No Moves", "No moves to undo")
 
     def show_legal_moves(self):
-        legal = list(self.board.legal_moves)
-        self.status_text.delete(1.0, tk.END)
-        self.status_text.insert(tk.END, f"Legal moves ({len(legal)}):\n\n")
-        for i, mv in enumerate(legal):
-            if i % 6 == 0 and i > 0: self.status_text.insert(tk.END, "\n")
-            self.status_text.insert(tk.END, f"{mv.usi():>6} ")
-        self.status_text.insert(tk.END, "\n")
+        legal, _ = self._legal()
+        key = self._legal_cache_key
+        if self._legal_listing[0] != key:
+            # Six moves per row, formatted once per position
+            rows = ["".join(f"{mv.usi():>6} " for mv in legal[i:i+6]) for i in range(0, len(legal), 6)]
+            self._legal_listing = (key, f"Legal moves ({len(legal)}):\n\n" + "\n".join(rows) + "\n")
+        self._clear_status_panel()
+        self.status_text.insert(tk.END, self._legal_listing[1])
 
     def show_kif_board(self):
-        kif = tk.Toplevel(self.root); kif.title("Board (KIF Format)"); kif.geometry("500x600"); kif.configure(bg='white')
-        text = tk.Text(kif, font=('Courier',10), wrap=tk.NONE, bg='white', fg='black')
-        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        text.insert(tk.END, self.board.kif_str()); text.config(state=tk.DISABLED)
+        if self._kif_win is None or not self._kif_win.winfo_exists():
+            kif = tk.Toplevel(self.root); kif.title("Board (KIF Format)"); kif.geometry("500x600"); kif.configure(bg='white')
+            kif.protocol("WM_DELETE_WINDOW", kif.withdraw)
+            text = tk.Text(kif, font=self._font_mono, wrap=tk.NONE, bg='white', fg='black')
+            text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            self._kif_win, self._kif_text, self._kif_last_sfen = kif, text, None
+        self._kif_win.deiconify(); self._kif_win.lift()
+        # Only re-serialise when the position changed since the last showing
+        sfen = self.board.sfen()
+        if sfen != self._kif_last_sfen:
+            text = self._kif_text
+            text.config(state=tk.NORMAL); text.delete(1.0, tk.END)
+            text.insert(tk.END, self.board.kif_str()); text.config(state=tk.DISABLED)
+            self._kif_last_sfen = sfen
 
     def update_status(self):
+        # Deselects and rejected clicks redraw the board without changing the game
+        key = (self.board.zobrist_hash(), self.board.move_number, len(self.move_history))
+        if key == self._last_status_key: return
+        if not self._status_pending:
+            self._status_pending = True
+            self.root.after_idle(self._flush_status)
+
+    def _flush_status(self):
+        self._status_pending = False
+        self._last_status_key = (self.board.zobrist_hash(), self.board.move_number, len(self.move_history))
+        if self._status_has_header: return
+        analysis = self._analysis()
         status = [f"Move: {self.board.move_number}",
-                  f"Turn: {'Black (先手)' if self.board.turn==shogi.BLACK else 'White (後手)'}",
-                  f"Check: {'Yes' if self.board.is_check() else 'No'}",
-                  f"Checkmate: {'Yes' if self.board.is_checkmate() else 'No'}",
-                  f"Stalemate: {'Yes' if self.board.is_stalemate() else 'No'}",
-                  f"Game Over: {'Yes' if self.board.is_game_over() else 'No'}","",
+                  _STATUS_TURN[self.board.turn],
+                  f"Check: {'Yes' if analysis['check'] else 'No'}",
+                  f"Checkmate: {'Yes' if analysis['checkmate'] else 'No'}",
+                  f"Stalemate: {'Yes' if analysis['stalemate'] else 'No'}",
+                  f"Game Over: {'Yes' if self._is_game_over() else 'No'}","",
                   "Recent moves:"]
-        for mv in self.move_history[-8:]: status.append(f"  {mv.usi()}")
-        current = self.status_text.get(1.0, tk.END)
-        if "Move:" not in current:
-            self.status_text.delete(1.0, tk.END); self.status_text.insert(tk.END, "\n".join(status))
+        for usi in self._recent_moves: status.append(f"  {usi}")
+        self.status_text.delete(1.0, tk.END); self.status_text.insert(tk.END, "\n".join(status))
+        self._status_has_header = True
 
     def log_move(self, move):
+        self._recent_moves.append(move.usi())
         player = "Black" if self.board.turn == shogi.WHITE else "White"
         if move.drop_piece_type is not None:
             sym = self.get_piece_symbol(move.drop_piece_type); sq = self.square_to_notation(move.to_square)
@@ -437,79 +679,91 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
             self.log_message(f"Move {self.board.move_number - 1}: {player} plays {move.usi()}")
 
     def log_message(self, message):
-        self.status_text.insert(tk.END, f"{message}\n"); self.status_text.see(tk.END)
+        # Lines logged during one event are written together on the next idle tick
+        if not self._pending_log:
+            self.root.after_idle(self._flush_log)
+        self._pending_log.append(message)
+
+    def _flush_log(self):
+        if not self._pending_log: return
+        self.status_text.insert(tk.END, "".join(f"{m}\n" for m in self._pending_log)); self.status_text.see(tk.END)
+        self._pending_log = []
+
+    def _clear_status_panel(self):
+        """Empty the status panel, dropping unwritten log lines and forcing a fresh status block."""
+        self.status_text.delete(1.0, tk.END)
+        self._pending_log = []
+        self._last_status_key = None
+        self._status_has_header = False
 
     def update_pieces_in_hand(self):
-        for w in self.black_pieces_frame.winfo_children(): w.destroy()
-        for w in self.white_pieces_frame.winfo_children(): w.destroy()
-        black = self.board.pieces_in_hand[shogi.BLACK]; white = self.board.pieces_in_hand[shogi.WHITE]
-        
-        # Black player's captured pieces (shown in black/dark colors)
-        if black:
-            col=0
-            for ptype,cnt in black.items():
-                if cnt>0:
-                    btn = tk.Button(self.black_pieces_frame, text=f"{self.get_piece_symbol(ptype)}×{cnt}",
-                                    font=('Courier',10,'bold'), width=6, height=1, 
-                                    bg='#2C2C2C', fg='#FFFFFF',  # Dark background, white text for black player
-                                    relief=tk.RAISED, bd=2, activebackground='#404040',
-                                    command=lambda pt=ptype,c=shogi.BLACK: self.select_piece_from_hand(pt,c))
-                    btn.grid(row=0,column=col,padx=2,pady=1); col+=1
-        else:
-            tk.Label(self.black_pieces_frame, text="None", font=('Arial',9), fg='#CCCCCC', bg='#1a1a1a').grid(row=0, column=0)
-        
-        # White player's captured pieces (shown in light/white colors)
-        if white:
-            col=0
-            for ptype,cnt in white.items():
-                if cnt>0:
-                    btn = tk.Button(self.white_pieces_frame, text=f"{self.get_piece_symbol(ptype)}×{cnt}",
-                                    font=('Courier',10,'bold'), width=6, height=1, 
-                                    bg='#F0F0F0', fg='#000000',  # Light background, black text for white player
-                                    relief=tk.RAISED, bd=2, activebackground='#E0E0E0',
-                                    command=lambda pt=ptype,c=shogi.WHITE: self.select_piece_from_hand(pt,c))
+        # Both hands and the symbol language fully determine the panels
+        key = (tuple(sorted(self.board.pieces_in_hand[shogi.BLACK].items())),
+               tuple(sorted(self.board.pieces_in_hand[shogi.WHITE].items())), self.use_japanese)
+        if key == self._hand_render_key: return
+        self._hand_render_key = key
+        for color in shogi.COLORS:
+            hand = self.board.pieces_in_hand[color]
+            col = 0
+            for pt in HAND_PIECE_TYPES:
+                btn = self.hand_buttons[(color, pt)]
+                cnt = hand[pt]
+                if cnt > 0:
+                    btn.config(text=f"{self.get_piece_symbol(pt)}×{cnt}")
                     btn.grid(row=0,column=col,padx=2,pady=1); col+=1
-        else:
-            tk.Label(self.white_pieces_frame, text="None", font=('Arial',9), fg='#666666', bg='#e8e8e8').grid(row=0, column=0)
-        self.update_hand_button_states()
+                else:
+                    btn.grid_remove()
+            if col:
+                self._hand_empty_labels[color].grid_remove()
+            else:
+                self._hand_empty_labels[color].grid(row=0, column=0)
 
     def select_piece_from_hand(self, piece_type, color):
         if self.ai_thinking or (self.game_mode == "human_vs_ai" and color != self.user_color): return
         if self.board.turn != color: return
         self.selected_square = None; self.selected_piece = None
         self.selected_hand_piece = piece_type; self.selected_hand_color = color
-        self.highlight_drop_moves(); self.update_display(); self.update_hand_button_states()
+        self.highlight_drop_moves(); self._request_redraw(); self.update_hand_button_states()
 
     def highlight_drop_moves(self):
         if self.selected_hand_piece is None: return
-        self.highlighted_moves = []
-        for mv in self.board.legal_moves:
-            if mv.drop_piece_type == self.selected_hand_piece and mv.from_square is None:
-                self.highlighted_moves.append(mv.to_square)
+        self.highlighted_moves = self._targets(None, self.selected_hand_piece)
 
     def update_hand_button_states(self):
-        pass  # simplified: visual states not critical for AI vs AI
+        """Sink the selected hand piece and flatten the hand that cannot move, touching only buttons that change."""
+        selected = (self.selected_hand_color, self.selected_hand_piece)
+        states = self._hand_button_state
+        for (color, pt), btn in self.hand_buttons.items():
+            if selected == (color, pt):
+                wanted = (HAND_SELECTED_BG, tk.SUNKEN)
+            elif color == self.board.turn and not self.ai_thinking:
+                wanted = (self._hand_button_bg[color], tk.RAISED)
+            else:
+                wanted = (self._hand_button_bg[color], tk.FLAT)
+            if states[btn] != wanted:
+                btn.config(bg=wanted[0], relief=wanted[1])
+                states[btn] = wanted
 
     def try_drop_move(self, to_square):
         if self.selected_hand_piece is None: return False
         mv = shogi.Move(None, to_square, False, self.selected_hand_piece)
-        if mv in self.board.legal_moves:
-            self.board.push(mv); self.move_history.append(mv); self.log_move(mv)
-            self.clear_selection(); self.update_display()
+        if mv in self._legal()[1]:
+            self._push_move(mv)
+            self.clear_selection(); self._request_redraw()
             
             # Check for checkmate after drop move
-            if self.board.is_checkmate():
+            if self._analysis()['checkmate']:
                 self.show_checkmate_dialog()
                 return True
                 
-            if self.game_mode == "human_vs_ai" and self.board.turn != self.user_color and not self.board.is_game_over():
+            if self.game_mode == "human_vs_ai" and self.board.turn != self.user_color and not self._is_game_over():
                 self.root.after(500, self.make_ai_move)
             return True
         else:
             self.log_message(f"Invalid drop to {self.square_to_notation(to_square)}"); return False
 
     def toggle_language(self):
-        self.use_japanese = not self.use_japanese; self.update_display()
+        self.use_japanese = not self.use_japanese; self._apply_language(); self._request_redraw()
         self.log_message(f"🌐 Switched to {'Japanese' if self.use_japanese else 'English'} display")
 
     def change_game_mode(self):
@@ -521,7 +775,7 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
             self.start_ai_vs_ai()
         else:
             self.log_message("👥 Switched to Human vs Human mode")
-        self.update_display()
+        self._request_redraw()
 
     def change_ai_difficulty(self, event=None):
         diff = self.difficulty_var.get()
@@ -531,32 +785,61 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
     # --- AI turns ---
     def make_ai_move(self):
         """Single AI (for human vs AI mode)."""
-        if self.ai_thinking or self.board.is_game_over(): return
-        self.ai_thinking = True; self.ai_thinking_label.config(text="🤖 AI thinking..."); self.update_display()
-        def run():
-            try:
-                ai = self.ai_black if self.board.turn == shogi.BLACK else self.ai_white
-                move = ai.get_best_move(self.board)
-                if move and move in self.board.legal_moves:
-                    self.root.after(0, self.execute_ai_move, move)
-                else:
-                    self.root.after(0, self.ai_move_failed)
-            except Exception as e:
-                self.root.after(0, self.ai_move_error, str(e))
-        th = threading.Thread(target=run, daemon=True); th.start()
+        if self.ai_thinking or self._is_game_over(): return
+        self.ai_thinking = True; self.ai_thinking_label.config(text="🤖 AI thinking..."); self._request_redraw()
+        self._submit_ai_search(self.execute_ai_move)
+
+    def _submit_ai_search(self, on_move):
+        """Search a copy of the board on the AI thread; on_move gets the result on the Tk thread."""
+        ai = self.ai_black if self.board.turn == shogi.BLACK else self.ai_white
+        # Never queue behind a search nobody is waiting for
+        self._stop_ai_search()
+        self._ai_request += 1
+        future = self._ai_executor.submit(ai.get_best_move, self.board.copy())
+        self._ai_search = (future, ai)
+        self.root.after(AI_POLL_MS, self._poll_ai, future, self._ai_request, on_move)
+
+    def _cancel_ai_search(self):
+        """Forget the running search; its result is dropped when it arrives."""
+        self._ai_request += 1
+        self.ai_thinking = False; self.ai_thinking_label.config(text="")
+
+    def _stop_ai_search(self):
+        """Stop the search on the worker and wait for it, leaving the worker idle and its AI safe to reset."""
+        if self._ai_search is None: return
+        future, ai = self._ai_search
+        self._ai_search = None
+        if not future.cancel():
+            ai.stop(); wait([future]); ai.resume()
+
+    def _poll_ai(self, future, request, on_move):
+        if not future.done():
+            self.root.after(AI_POLL_MS, self._poll_ai, future, request, on_move); return
+        if self._ai_search is not None and self._ai_search[0] is future:
+            self._ai_search = None
+        # Drop results of a cancelled search (new game or undo while it ran)
+        if request != self._ai_request: return
+        try:
+            move = future.result()
+        except Exception as e:
+            self.ai_move_error(str(e)); return
+        if move and move in self._legal()[1]:
+            on_move(move)
+        else:
+            self.ai_move_failed()
 
     def execute_ai_move(self, move):
-        self.board.push(move); self.move_history.append(move); self.log_move(move)
-        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.clear_selection(); self.update_display()
+        self._push_move(move)
+        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.clear_selection(); self._request_redraw()
         
         # Check for checkmate after the move
-        if self.board.is_checkmate():
+        if self._analysis()['checkmate']:
             self.show_checkmate_dialog()
 
     def ai_move_failed(self):
-        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.log_message("❌ AI could not find a valid move"); self.update_display()
+        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.log_message("❌ AI could not find a valid move"); self._request_redraw()
     def ai_move_error(self, msg):
-        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.log_message(f"❌ AI error: {msg}"); self.update_display()
+        self.ai_thinking = False; self.ai_thinking_label.config(text=""); self.log_message(f"❌ AI error: {msg}"); self._request_redraw()
 
     # --- AI vs AI loop ---
     def start_ai_vs_ai(self):
@@ -572,24 +855,15 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
         self.log_message("⏸ Paused AI vs AI")
 
     def _ai_vs_ai_tick(self):
-        if not self.ai_vs_ai_running or self.board.is_game_over() or self.game_mode != "ai_vs_ai":
+        if not self.ai_vs_ai_running or self._is_game_over() or self.game_mode != "ai_vs_ai":
             self.ai_thinking_label.config(text=""); return
         self.ai_thinking_label.config(text="🤖🤖 AIs thinking...")
-        def run():
-            try:
-                ai = self.ai_black if self.board.turn == shogi.BLACK else self.ai_white
-                move = ai.get_best_move(self.board)
-                if move and move in self.board.legal_moves:
-                    self.root.after(0, self.execute_ai_move, move)
-                    self.root.after(self.ai_delay_ms, self._ai_vs_ai_tick)
-                else:
-                    self.root.after(0, self.ai_move_failed)
-            except Exception as e:
-                self.root.after(0, self.ai_move_error, str(e))
-        threading.Thread(target=run, daemon=True).start()
+        self._submit_ai_search(self._execute_ai_vs_ai_move)
+
+    def _execute_ai_vs_ai_move(self, move):
+        self.execute_ai_move(move)
+        self.root.after(self.ai_delay_ms, self._ai_vs_ai_tick)
 
-<<<<<<< Updated upstream
-=======
     def update_castle_status(self):
         """Update the castle formation status display."""
         # Update Black's castle status
@@ -618,7 +892,7 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
 
     def show_checkmate_dialog(self):
         """Show checkmate dialog with winner information."""
-        if not self.board.is_checkmate():
+        if not self._analysis()['checkmate']:
             return
             
         # Determine the winner (opposite of current turn since current player is checkmated)
@@ -655,7 +929,6 @@ Manual: USI like '7g7f'. AI vs AI shows different strategies."""
         # Log the result
         self.log_message(f"🏆 GAME OVER - {winner_name} wins by checkmate!")
 
->>>>>>> Stashed changes
 def main():
     root = tk.Tk()
     app = EnhancedShogiGUI(root)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+import shogi
+from shogi_ai import ShogiAI, NULL_MOVE_MIN_DEPTH
+
+
+class AITestCase(unittest.TestCase):
+    def test_search_windows_are_never_empty(self):
+        # Every node must be entered with alpha < beta; an empty window makes
+        # it cut off after its first move and store a bound that does not hold
+        random.seed(6)
+        board = shogi.Board()
+        for _ in range(6):
+            board.push(random.choice(list(board.legal_moves)))
+        ai = ShogiAI()
+        windows = []
+        negamax, quiescence = ai._negamax, ai._quiescence
+
+        def recording_negamax(board, depth, alpha, beta, ply=0):
+            windows.append(('negamax', depth, alpha, beta))
+            return negamax(board, depth, alpha, beta, ply)
+
+        def recording_quiescence(board, alpha, beta, depth):
+            windows.append(('quiescence', depth, alpha, beta))
+            return quiescence(board, alpha, beta, depth)
+
+        ai._negamax, ai._quiescence = recording_negamax, recording_quiescence
+        # A full window (beta at +inf) and a narrow one, which tries a null move
+        score = ai._negamax(board, NULL_MOVE_MIN_DEPTH, float('-inf'), float('inf'), 1)
+        ai._negamax(board, NULL_MOVE_MIN_DEPTH, score - 0.5, score + 0.5, 1)
+
+        self.assertTrue(any(depth < NULL_MOVE_MIN_DEPTH - 1 for kind, depth, _, _ in windows if kind == 'negamax'))
+        self.assertEqual([w for w in windows if w[2] >= w[3]], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -143,6 +143,26 @@ class BoardTestCase(unittest.TestCase):
         board.push(shogi.Move.from_usi("6b8b"))
         self.assertTrue(board.is_fourfold_repetition())
 
+    def test_copy(self):
+        board = shogi.Board()
+        for move_str in ["7g7f", "3c3d", "8h2b+"]:
+            board.push(shogi.Move.from_usi(move_str))
+        copied = board.copy()
+        self.assertEqual(board, copied)
+        self.assertEqual(board.sfen(), copied.sfen())
+        self.assertEqual(board.zobrist_hash(), copied.zobrist_hash())
+        self.assertEqual(list(board.move_stack), list(copied.move_stack))
+        self.assertEqual(set(board.legal_moves), set(copied.legal_moves))
+
+        copied.push(shogi.Move.from_usi("3a2b"))
+        self.assertNotEqual(board, copied)
+        self.assertEqual(board.pieces_in_hand[shogi.WHITE][shogi.BISHOP], 0)
+        self.assertEqual(len(board.move_stack), 3)
+        copied.pop()
+        copied.pop()
+        self.assertEqual(copied.pieces_in_hand[shogi.BLACK][shogi.BISHOP], 0)
+        self.assertEqual(board.pieces_in_hand[shogi.BLACK][shogi.BISHOP], 1)
+
     def test_legal_moves_in(self):
         # https://github.com/gunyarakun/python-shogi/issues/3
         board = shogi.Board()